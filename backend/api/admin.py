@@ -1,37 +1,33 @@
 from django.contrib import admin
-from django.db.models import Count
 from django.urls import reverse
 from django.utils.html import mark_safe
 
-from api.models import FavorRecipe, Ingredient, Recipe, ShoppingList, Tag
+from api.models import (FavorRecipe, Ingredient, Recipe, ShoppingList,
+                        SimilarRecipe, Tag, TrendingRecipe)
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author_link', 'favorite_count', 'tag_list', 'id')
+    list_display = (
+        'name', 'author_link', 'favorites_count', 'in_carts_count',
+        'tag_list', 'id'
+    )
     list_display_links = ('id', 'name')
     search_fields = ('name', 'text', 'ingredients__name')
     list_filter = ('tags', 'author')
+    readonly_fields = ('favorites_count', 'in_carts_count')
 
     def author_link(self, obj):
         url = reverse('admin:users_user_change', args=[obj.author.id])
         return mark_safe('<a href="%s">%s</a>' % (url, obj.author.username))
 
-    def favorite_count(self, obj):
-        return obj.favorite_count
-
     def tag_list(self, obj):
-        tl = list(obj.tags.values('name'))
-        return ', '.join(i['name'] for i in tl)
+        return ', '.join(tag.name for tag in obj.tags.all())
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        queryset = queryset.prefetch_related('tags', 'ingredients')
-        queryset = queryset.prefetch_related('favorite_recipes').annotate(
-            favorite_count=Count('favorite_recipes')
-        )
+        queryset = queryset.select_related('author').prefetch_related('tags')
         return queryset
 
-    favorite_count.short_description = 'В избранном'
     tag_list.short_description = 'Тэги'
     author_link.short_description = 'Автор рецепта'
 
@@ -58,8 +54,20 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     )
 
 
+class TrendingRecipeAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'recipe', 'score')
+    list_select_related = ('recipe', )
+
+
+class SimilarRecipeAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'rank', 'similar', 'score')
+    list_select_related = ('recipe', 'similar')
+
+
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngridientAdmin)
 admin.site.register(FavorRecipe, FavorAdmin)
 admin.site.register(ShoppingList, ShoppingCartAdmin)
+admin.site.register(TrendingRecipe, TrendingRecipeAdmin)
+admin.site.register(SimilarRecipe, SimilarRecipeAdmin)
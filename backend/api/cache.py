@@ -0,0 +1,340 @@
+import math
+import random
+import time
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from api.models import (FavorRecipe, FeedEntry, Ingredient, ShoppingList,
+                        ShoppingListIngredient, Tag)
+from api.versions import (SHOPPING_LIST_VERSION_KEY, bump_version,
+                          get_version)
+from users.models import Follow
+
+RECIPES_GENERATION_KEY = 'recipes_generation'
+INGREDIENTS_VERSION_KEY = 'ingredients_version'
+TAGS_VERSION_KEY = 'tags_version'
+RECIPE_TAGS_VERSION_KEY = 'recipe_tags_version'
+RECIPE_SEARCH_VERSION_KEY = 'recipe_search_version'
+REFERENCE_CHECK_INTERVAL = 1
+CHANGE_LOG_SIZE = 1000
+CHANGE_LOG_TIMEOUT = 60 * 60
+RECIPES_LIST_TIMEOUT = 60 * 15
+USER_FLAGS_TIMEOUT = 60 * 60
+FEED_CELEBRITIES_KEY = 'feed_celebrities'
+FEED_CELEBRITIES_TIMEOUT = 60 * 10
+SHOPPING_LIST_TIMEOUT = 60 * 60
+SHOPPING_LIST_CACHE_ITEMS = 200
+STAMPEDE_LOCK_TIMEOUT = 30
+STAMPEDE_WAIT_TIMEOUT = 5
+STAMPEDE_POLL_INTERVAL = 0.05
+RECIPES_LIST_PARAMS = (
+    'author', 'page', 'limit', 'cursor', 'tags_match', 'search'
+)
+RECIPES_USER_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """Значение из кэша с защитой от одновременного пересчёта.
+
+    Пересчёт начинается заранее с вероятностью, растущей к концу TTL
+    (пропорционально времени прошлого вычисления). Вычисляет только
+    взявший блокировку, остальные отдают старое значение или ждут
+    нового не дольше STAMPEDE_WAIT_TIMEOUT секунд, пока блокировка
+    существует. Если блокировку не взять из-за недоступного кэша,
+    значение вычисляется сразу.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, cost, expires = entry
+        jitter = cost * beta * math.log(1 - random.random())
+        if time.time() - jitter < expires:
+            return value
+    lock = f'{key}:lock'
+    locked = cache.add(lock, 1, STAMPEDE_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry[0]
+        deadline = time.monotonic() + STAMPEDE_WAIT_TIMEOUT
+        while time.monotonic() < deadline and cache.get(lock) is not None:
+            time.sleep(STAMPEDE_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        cache.set(
+            key, (value, finished - started, finished + timeout), timeout
+        )
+    finally:
+        if locked:
+            cache.delete(lock)
+    return value
+
+
+def get_recipes_generation():
+    return get_version(RECIPES_GENERATION_KEY)
+
+
+def bump_recipes_generation():
+    """Новое поколение списков рецептов после фиксации транзакции.
+
+    Иначе параллельный запрос успел бы закэшировать под новым поколением
+    страницу без ещё не зафиксированных изменений.
+    """
+    transaction.on_commit(lambda: bump_version(RECIPES_GENERATION_KEY))
+
+
+class ReferenceCache:
+    """Словарь справочных данных в памяти процесса.
+
+    Актуальность сверяется с версией в общем кэше не чаще раза в
+    REFERENCE_CHECK_INTERVAL секунд, поэтому все воркеры перечитывают
+    данные после bump_version(version_key).
+    """
+
+    def __init__(self, version_key, loader):
+        self.version_key = version_key
+        self.loader = loader
+        self.version = None
+        self.data = None
+        self.checked = 0
+
+    def get(self, force=False):
+        now = time.monotonic()
+        if (force or self.data is None or
+                now - self.checked > REFERENCE_CHECK_INTERVAL):
+            version = get_version(self.version_key)
+            self.checked = now
+            if force or self.data is None or version != self.version:
+                self.data = self.loader()
+                self.version = version
+        return self.data
+
+    def lookup(self, key):
+        data = self.get()
+        if key not in data:
+            data = self.get(force=True)
+        return data.get(key)
+
+    def reset(self):
+        self.data = None
+
+    def invalidate(self):
+        """Сбрасывает данные во всех воркерах после фиксации транзакции.
+
+        Сброс до фиксации дал бы другим воркерам перечитать ещё не
+        зафиксированное состояние и держать его до следующей версии.
+        """
+        def invalidate():
+            self.reset()
+            bump_version(self.version_key)
+        transaction.on_commit(invalidate)
+
+
+class ChangeLogCache(ReferenceCache):
+    """ReferenceCache, догоняющий изменения по журналу в общем кэше.
+
+    record(ids) после фиксации транзакции увеличивает версию, кладёт
+    список id под её номером и сразу догоняет данные своего процесса.
+    Процесс перечитывает строки changes(ids) только для пропущенных id и
+    передаёт их в data.replace(), а при пробелах в журнале строит данные
+    заново.
+    """
+
+    def __init__(self, version_key, loader, changes):
+        super().__init__(version_key, loader)
+        self.changes = changes
+        self.change_key = f'{version_key}_change_%s'
+
+    def get(self, force=False):
+        if (not force and self.data is not None and
+                time.monotonic() - self.checked > REFERENCE_CHECK_INTERVAL):
+            self.catch_up()
+        return super().get(force)
+
+    def catch_up(self):
+        version = get_version(self.version_key)
+        self.checked = time.monotonic()
+        if version == self.version:
+            return
+        if not 0 < version - self.version <= CHANGE_LOG_SIZE:
+            self.reset()
+            return
+        keys = [
+            self.change_key % number
+            for number in range(self.version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            self.reset()
+            return
+        ids = set().union(*changes.values())
+        self.data.replace(ids, self.changes(ids))
+        self.version = version
+
+    def record(self, ids):
+        """Записывает изменение ids после фиксации транзакции."""
+        ids = list(ids)
+
+        def record():
+            try:
+                version = cache.incr(self.version_key)
+            except ValueError:
+                self.reset()
+                return
+            cache.set(self.change_key % version, ids, CHANGE_LOG_TIMEOUT)
+            if self.data is not None:
+                self.catch_up()
+
+        transaction.on_commit(record)
+
+
+def load_ingredients():
+    return {
+        pk: {'id': pk, 'name': name, 'measurement_unit': unit}
+        for pk, name, unit in Ingredient.objects.values_list(
+            'pk', 'name', 'measurement_unit'
+        )
+    }
+
+
+def load_tags():
+    return {
+        tag['id']: tag
+        for tag in Tag.objects.values('id', 'name', 'color', 'slug')
+    }
+
+
+ingredients = ReferenceCache(INGREDIENTS_VERSION_KEY, load_ingredients)
+tags = ReferenceCache(TAGS_VERSION_KEY, load_tags)
+
+
+def is_recipe_list_cacheable(query_params):
+    return not any(query_params.get(name) for name in RECIPES_USER_PARAMS)
+
+
+def recipe_list_key(request):
+    """Ключ анонимной страницы списка рецептов.
+
+    Кроме поколения списков в ключ входят версии индексов, которыми
+    процесс отфильтрует страницу: отставший воркер положит её под старой
+    версией, и догнавшие изменения воркеры её не прочтут.
+    """
+    from api.search import list_index_versions
+
+    params = request.query_params
+    normalized = [('tags', ','.join(sorted(set(params.getlist('tags')))))]
+    normalized += [
+        (name, params[name]) for name in RECIPES_LIST_PARAMS if name in params
+    ]
+    digest = md5(
+        f'{request.get_host()}{request.path}?{urlencode(normalized)}'.encode()
+    ).hexdigest()
+    return 'recipes_list_%s_%s' % ('_'.join(map(str, (
+        get_recipes_generation(), *list_index_versions(params)
+    ))), digest)
+
+
+def user_flags_key(user_id):
+    return 'recipes_user_%s' % user_id
+
+
+def get_user_flags(user):
+    if user.is_anonymous:
+        return frozenset(), frozenset(), frozenset()
+    return get_or_compute(user_flags_key(user.id), lambda: (
+        frozenset(FavorRecipe.objects.filter(
+            author=user
+        ).values_list('recipes_id', flat=True)),
+        frozenset(ShoppingList.objects.filter(
+            author=user
+        ).values_list('recipes_id', flat=True)),
+        frozenset(Follow.objects.filter(
+            user=user
+        ).values_list('author_id', flat=True)),
+    ), USER_FLAGS_TIMEOUT)
+
+
+def drop_user_flags(user_id):
+    transaction.on_commit(lambda: cache.delete(user_flags_key(user_id)))
+
+
+def overlay_user_flags(data, user):
+    favorites, cart, following = get_user_flags(user)
+    results = []
+    for recipe in data['results']:
+        author = dict(
+            recipe['author'],
+            is_subscribed=recipe['author']['id'] in following
+        )
+        results.append(dict(
+            recipe,
+            author=author,
+            is_favorited=recipe['id'] in favorites,
+            is_in_shopping_cart=recipe['id'] in cart
+        ))
+    return dict(data, results=results)
+
+
+def feed_celebrities():
+    return get_or_compute(FEED_CELEBRITIES_KEY, lambda: frozenset(
+        Follow.objects.values('author').annotate(
+            followers=Count('pk')
+        ).filter(
+            followers__gte=settings.FEED_FANOUT_LIMIT
+        ).order_by().values_list('author', flat=True)
+    ), FEED_CELEBRITIES_TIMEOUT)
+
+
+def restore_fan_out(author_id):
+    """Возвращает в рассылку автора, у которого стало меньше
+    FEED_FANOUT_LIMIT подписчиков.
+
+    Его рецепты сначала рассылаются подписчикам, и только затем
+    сбрасывается feed_celebrities: до этого лента добирает их через
+    UNION ALL, после этого они уже лежат в FeedEntry.
+    """
+    FeedEntry.objects.backfill_followers(author_id)
+    cache.delete(FEED_CELEBRITIES_KEY)
+
+
+def shopping_list_key(user):
+    return 'shopping_list_%s_%s_%s' % (
+        user.id, get_version(SHOPPING_LIST_VERSION_KEY % user.id),
+        get_version(INGREDIENTS_VERSION_KEY)
+    )
+
+
+def get_shop_list(user):
+    """Строки списка покупок: короткий список из кэша, иначе потоком.
+
+    Строки читаются из БД через .iterator() по мере отдачи ответа. В кэш
+    попадает только список не длиннее SHOPPING_LIST_CACHE_ITEMS, поэтому
+    длинный список никогда не собирается в памяти целиком.
+    """
+    key = f'{shopping_list_key(user)}:items'
+    items = cache.get(key)
+    if items is not None:
+        return items
+    return _cache_short_list(
+        key, ShoppingListIngredient.objects.shop_list(user).iterator()
+    )
+
+
+def _cache_short_list(key, items):
+    collected = []
+    for item in items:
+        if collected is not None:
+            collected.append(item)
+            if len(collected) > SHOPPING_LIST_CACHE_ITEMS:
+                collected = None
+        yield item
+    if collected is not None:
+        cache.set(key, collected, SHOPPING_LIST_TIMEOUT)
@@ -0,0 +1,428 @@
+import csv
+import os
+import struct
+import zlib
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain, islice
+
+from django.conf import settings
+
+FOOTER = 'FoodGram, 2021'
+CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+PAGE_MARGIN = 50
+FONT_SIZE = 12
+LEADING = 16
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * PAGE_MARGIN) // LEADING
+SUBSET_TABLES = (
+    'cvt ', 'fpgm', 'glyf', 'head', 'hhea', 'hmtx', 'loca', 'maxp', 'prep'
+)
+SUBSET_CACHE_SIZE = 128
+COMPOSITE_MORE = 0x0020
+
+
+def shop_list_lines(shop_list):
+    for item in shop_list:
+        yield f'{item["name"]} - {item["sum"]} {item["unit"]}'
+
+
+def render_txt(shop_list):
+    for line in shop_list_lines(shop_list):
+        yield f'{line} \r\n'
+    yield '\r\n'
+    yield FOOTER
+
+
+class _Echo:
+
+    def write(self, value):
+        return value
+
+
+def render_csv(shop_list):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for item in shop_list:
+        yield writer.writerow((item['name'], item['sum'], item['unit']))
+
+
+def render_pdf(shop_list):
+    font_path = settings.SHOPPING_LIST_PDF_FONT
+    if font_path and os.path.exists(font_path):
+        font = TrueTypeFont(font_path)
+    else:
+        font = StandardFont()
+    writer = PDFWriter(font)
+    lines = chain(
+        ('Список покупок', ''), shop_list_lines(shop_list), ('', FOOTER)
+    )
+    yield writer.start()
+    page = list(islice(lines, LINES_PER_PAGE))
+    while page:
+        yield writer.page(page)
+        page = list(islice(lines, LINES_PER_PAGE))
+    yield from writer.finish()
+
+
+def _pdf_string(text):
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return f'({text})'
+
+
+class StandardFont:
+    """Helvetica без встраивания: только латиница (cp1252)."""
+
+    def encode(self, text):
+        return _pdf_string(text.encode('cp1252', 'replace').decode('cp1252'))
+
+    def objects(self, writer, number):
+        yield writer.obj(number, (
+            '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+            '/Encoding /WinAnsiEncoding >>'
+        ))
+
+
+class TrueTypeMetrics:
+    """Глифы и метрики TrueType-файла, нужные для встраивания в PDF."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as font_file:
+            data = font_file.read()
+        self.tables = {}
+        for index in range(struct.unpack('>H', data[4:6])[0]):
+            tag, _, offset, length = struct.unpack(
+                '>4sLLL', data[12 + 16 * index:28 + 16 * index]
+            )
+            self.tables[tag.decode('latin-1')] = (offset, length)
+        tables = {tag: offset for tag, (offset, _) in self.tables.items()}
+        head, hhea = tables['head'], tables['hhea']
+        self.units = struct.unpack('>H', data[head + 18:head + 20])[0]
+        self.bbox = struct.unpack('>4h', data[head + 36:head + 44])
+        self.ascent, self.descent = struct.unpack(
+            '>hh', data[hhea + 4:hhea + 8]
+        )
+        metrics = struct.unpack('>H', data[hhea + 34:hhea + 36])[0]
+        self.advances = struct.unpack(
+            '>' + 'Hh' * metrics,
+            data[tables['hmtx']:tables['hmtx'] + 4 * metrics]
+        )[::2]
+        self.glyph_count = struct.unpack(
+            '>H', data[tables['maxp'] + 4:tables['maxp'] + 6]
+        )[0]
+        if struct.unpack('>h', data[head + 50:head + 52])[0]:
+            fmt, scale = '>%dL', 1
+        else:
+            fmt, scale = '>%dH', 2
+        self.locations = [
+            location * scale for location in struct.unpack(
+                fmt % (self.glyph_count + 1),
+                data[tables['loca']:tables['loca'] + (
+                    4 // scale * (self.glyph_count + 1)
+                )]
+            )
+        ]
+        self._read_cmap(data, tables['cmap'])
+
+    def _read_cmap(self, data, cmap):
+        count = struct.unpack('>H', data[cmap + 2:cmap + 4])[0]
+        for index in range(count):
+            platform, encoding, offset = struct.unpack(
+                '>HHL', data[cmap + 4 + 8 * index:cmap + 12 + 8 * index]
+            )
+            table = cmap + offset
+            if ((platform, encoding) in ((3, 1), (0, 3)) and
+                    struct.unpack('>H', data[table:table + 2])[0] == 4):
+                break
+        else:
+            raise ValueError(f'{self.path}: нет таблицы cmap формата 4')
+        segments = struct.unpack('>H', data[table + 6:table + 8])[0] // 2
+        fmt = '>%dH' % segments
+        ends = table + 14
+        starts = ends + 2 * segments + 2
+        deltas = starts + 2 * segments
+        self.range_offsets = deltas + 2 * segments
+        self.ends = struct.unpack(fmt, data[ends:starts - 2])
+        self.starts = struct.unpack(fmt, data[starts:deltas])
+        self.deltas = struct.unpack(fmt, data[deltas:self.range_offsets])
+        self.offsets = struct.unpack(
+            fmt, data[self.range_offsets:self.range_offsets + 2 * segments]
+        )
+        self.data = data
+
+    def glyph(self, char):
+        code = ord(char)
+        index = bisect_left(self.ends, code)
+        if index == len(self.ends) or self.starts[index] > code:
+            return 0
+        if not self.offsets[index]:
+            return (code + self.deltas[index]) & 0xFFFF
+        address = (
+            self.range_offsets + 2 * index + self.offsets[index] +
+            2 * (code - self.starts[index])
+        )
+        glyph = struct.unpack('>H', self.data[address:address + 2])[0]
+        return (glyph + self.deltas[index]) & 0xFFFF if glyph else 0
+
+    def width(self, glyph):
+        advance = self.advances[min(glyph, len(self.advances) - 1)]
+        return advance * 1000 // self.units
+
+    def table(self, tag):
+        offset, length = self.tables[tag]
+        return self.data[offset:offset + length]
+
+    def outline(self, glyph):
+        start = self.tables['glyf'][0]
+        return self.data[
+            start + self.locations[glyph]:start + self.locations[glyph + 1]
+        ]
+
+    def components(self, glyph):
+        """Глифы, из которых собран составной глиф."""
+        outline = self.outline(glyph)
+        if len(outline) < 10 or struct.unpack('>h', outline[:2])[0] >= 0:
+            return
+        position = 10
+        while True:
+            flags, component = struct.unpack(
+                '>HH', outline[position:position + 4]
+            )
+            yield component
+            position += 8 if flags & 0x0001 else 6
+            if flags & 0x0008:
+                position += 2
+            elif flags & 0x0040:
+                position += 4
+            elif flags & 0x0080:
+                position += 8
+            if not flags & COMPOSITE_MORE:
+                return
+
+    def subset(self, glyphs):
+        """Файл шрифта только с глифами glyphs и их составляющими.
+
+        Номера глифов сохраняются (в PDF /CIDToGIDMap /Identity), у
+        остальных пустые записи в glyf. Таблицы, которые PDF-просмотрщику
+        не нужны, отбрасываются.
+        """
+        keep = set()
+        pending = [0, *glyphs]
+        while pending:
+            glyph = pending.pop()
+            if glyph not in keep and glyph < self.glyph_count:
+                keep.add(glyph)
+                pending.extend(self.components(glyph))
+        outlines, locations, size = [], [], 0
+        for glyph in range(self.glyph_count):
+            locations.append(size)
+            if glyph in keep:
+                outline = self.outline(glyph)
+                outline += b'\0' * (-len(outline) % 4)
+                outlines.append(outline)
+                size += len(outline)
+        locations.append(size)
+        head = bytearray(self.table('head'))
+        head[8:12] = bytes(4)
+        head[50:52] = struct.pack('>h', 1)
+        tables = {
+            tag: self.table(tag) for tag in SUBSET_TABLES
+            if tag in self.tables
+        }
+        tables.update(
+            head=bytes(head), glyf=b''.join(outlines),
+            loca=struct.pack('>%dL' % len(locations), *locations)
+        )
+        return build_font(tables)
+
+
+def _checksum(data):
+    data += b'\0' * (-len(data) % 4)
+    return sum(struct.unpack('>%dL' % (len(data) // 4), data)) & 0xFFFFFFFF
+
+
+def build_font(tables):
+    """Собирает TrueType-файл из словаря таблиц."""
+    count = len(tables)
+    selector = count.bit_length() - 1
+    header = struct.pack(
+        '>LHHHH', 0x00010000, count, 16 << selector, selector,
+        16 * count - (16 << selector)
+    )
+    offset = len(header) + 16 * count
+    directory, body, offsets = [], [], {}
+    for tag in sorted(tables):
+        data = tables[tag]
+        directory.append(struct.pack(
+            '>4sLLL', tag.encode('latin-1'), _checksum(data), offset,
+            len(data)
+        ))
+        offsets[tag] = offset
+        data += b'\0' * (-len(data) % 4)
+        body.append(data)
+        offset += len(data)
+    font = bytearray(header + b''.join(directory) + b''.join(body))
+    adjustment = offsets['head'] + 8
+    font[adjustment:adjustment + 4] = struct.pack(
+        '>L', (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF
+    )
+    return bytes(font)
+
+
+@lru_cache(maxsize=None)
+def truetype_metrics(path):
+    return TrueTypeMetrics(path)
+
+
+@lru_cache(maxsize=SUBSET_CACHE_SIZE)
+def font_subset(path, glyphs):
+    """Сжатое подмножество шрифта и его размер до сжатия."""
+    data = truetype_metrics(path).subset(glyphs)
+    return zlib.compress(data), len(data)
+
+
+class TrueTypeFont:
+    """Встраиваемый TrueType-шрифт (Type0, Identity-H) для кириллицы."""
+
+    def __init__(self, path):
+        self.path = path
+        self.metrics = truetype_metrics(path)
+        self.used = {}
+
+    def encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.metrics.glyph(char)
+            self.used.setdefault(glyph, char)
+            glyphs.append('%04X' % glyph)
+        return '<%s>' % ''.join(glyphs)
+
+    def objects(self, writer, number):
+        cid_font, descriptor, font_file, to_unicode = (
+            writer.reserve() for _ in range(4)
+        )
+        widths = ' '.join(
+            f'{glyph} [{self.metrics.width(glyph)}]'
+            for glyph in sorted(self.used)
+        )
+        metrics = self.metrics
+        scale = 1000 / metrics.units
+        yield writer.obj(number, (
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /ShopListFont '
+            f'/Encoding /Identity-H /DescendantFonts [{cid_font} 0 R] '
+            f'/ToUnicode {to_unicode} 0 R >>'
+        ))
+        yield writer.obj(cid_font, (
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /ShopListFont '
+            f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+            f'/Supplement 0 >> /FontDescriptor {descriptor} 0 R '
+            f'/CIDToGIDMap /Identity /W [{widths}] >>'
+        ))
+        yield writer.obj(descriptor, (
+            '<< /Type /FontDescriptor /FontName /ShopListFont /Flags 32 '
+            '/FontBBox [%s] /ItalicAngle 0 /Ascent %d /Descent %d '
+            '/CapHeight %d /StemV 80 /FontFile2 %d 0 R >>' % (
+                ' '.join(str(int(value * scale)) for value in metrics.bbox),
+                metrics.ascent * scale, metrics.descent * scale,
+                metrics.ascent * scale, font_file
+            )
+        ))
+        data, size = font_subset(self.path, frozenset(self.used))
+        yield writer.stream(
+            font_file, data, f'/Filter /FlateDecode /Length1 {size} '
+        )
+        cmap = '\n'.join(
+            '<%04X> <%s>' % (glyph, char.encode('utf-16-be').hex().upper())
+            for glyph, char in sorted(self.used.items())
+        )
+        yield writer.stream(to_unicode, (
+            '/CIDInit /ProcSet findresource begin 12 dict begin begincmap '
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+            '/Supplement 0 >> def /CMapName /Adobe-Identity-UCS def '
+            '/CMapType 2 def 1 begincodespacerange <0000> <FFFF> '
+            f'endcodespacerange {len(self.used)} beginbfchar\n{cmap}\n'
+            'endbfchar endcmap CMapName currentdict /CMap defineresource pop '
+            'end end'
+        ).encode())
+
+
+class PDFWriter:
+    """Пишет PDF по одной странице, не держа документ в памяти.
+
+    Дерево страниц, шрифт и таблица xref выводятся в конце: от уже
+    отданных страниц остаются только номера объектов и смещения.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.position = 0
+        self.offsets = {}
+        self.count = 0
+        self.catalog = self.reserve()
+        self.pages = self.reserve()
+        self.font_number = self.reserve()
+        self.kids = []
+
+    def reserve(self):
+        self.count += 1
+        return self.count
+
+    def _write(self, data):
+        self.position += len(data)
+        return data
+
+    def obj(self, number, body):
+        self.offsets[number] = self.position
+        return self._write(f'{number} 0 obj\n{body}\nendobj\n'.encode())
+
+    def stream(self, number, data, extra=''):
+        self.offsets[number] = self.position
+        return self._write(
+            f'{number} 0 obj\n<< /Length {len(data)} {extra}>>\n'
+            f'stream\n'.encode() + data + b'\nendstream\nendobj\n'
+        )
+
+    def start(self):
+        return self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def page(self, lines):
+        content = ''.join(
+            f'{self.font.encode(line)} Tj T* ' for line in lines
+        )
+        content = (
+            f'BT /F1 {FONT_SIZE} Tf {LEADING} TL '
+            f'{PAGE_MARGIN} {PAGE_HEIGHT - PAGE_MARGIN} Td {content}ET'
+        )
+        content_number, page_number = self.reserve(), self.reserve()
+        self.kids.append(page_number)
+        return self.stream(content_number, content.encode()) + self.obj(
+            page_number, (
+                f'<< /Type /Page /Parent {self.pages} 0 R '
+                f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                f'/Resources << /Font << /F1 {self.font_number} 0 R >> >> '
+                f'/Contents {content_number} 0 R >>'
+            )
+        )
+
+    def finish(self):
+        kids = ' '.join(f'{number} 0 R' for number in self.kids)
+        yield self.obj(self.pages, (
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(self.kids)} >>'
+        ))
+        yield from self.font.objects(self, self.font_number)
+        yield self.obj(
+            self.catalog, f'<< /Type /Catalog /Pages {self.pages} 0 R >>'
+        )
+        xref = self.position
+        entries = ''.join(
+            '%010d 00000 n \n' % self.offsets[number]
+            for number in range(1, self.count + 1)
+        )
+        yield self._write((
+            f'xref\n0 {self.count + 1}\n0000000000 65535 f \n{entries}'
+            f'trailer\n<< /Size {self.count + 1} /Root {self.catalog} 0 R >>'
+            f'\nstartxref\n{xref}\n%%EOF\n'
+        ).encode())
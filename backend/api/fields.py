@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class SearchVectorField(models.TextField):
+    """Колонка tsvector в PostgreSQL и обычный текст в остальных СУБД.
+
+    В отличие от django.contrib.postgres не требует psycopg2 при импорте,
+    поэтому модели загружаются и на SQLite.
+    """
+    description = 'Поисковый вектор'
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'tsvector'
+        return super().db_type(connection)
+
+
+@SearchVectorField.register_lookup
+class SearchMatch(models.Lookup):
+    lookup_name = 'matches'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} @@ {rhs}', (*lhs_params, *rhs_params)
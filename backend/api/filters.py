@@ -1,12 +1,36 @@
 import django_filters as filters
 
+from api.cache import tags as tag_catalog
 from api.models import Recipe
+from api.search import filter_by_tags, search_recipes
+
+TAGS_MATCH_CHOICES = (('any', 'Любой из тэгов'), ('all', 'Все тэги'))
+
+
+def tag_choices():
+    return [(tag['slug'], tag['name']) for tag in tag_catalog.get().values()]
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices, method='tags_filter'
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=TAGS_MATCH_CHOICES, method='tags_match_filter'
+    )
     is_favorited = filters.BooleanFilter(method='fav_filter')
     is_in_shopping_cart = filters.BooleanFilter(method='shop_filter')
+    search = filters.CharFilter(method='search_filter')
+
+    def tags_filter(self, queryset, name, value):
+        match_all = self.form.cleaned_data.get('tags_match') == 'all'
+        return filter_by_tags(queryset, value, match_all)
+
+    def tags_match_filter(self, queryset, name, value):
+        return queryset
+
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def fav_filter(self, queryset, name, value):
         query = queryset.filter(is_favorited=value)
@@ -18,8 +42,7 @@ class RecipeFilter(filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
-
-
-class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+        fields = [
+            'author', 'tags', 'tags_match', 'is_favorited',
+            'is_in_shopping_cart', 'search'
+        ]
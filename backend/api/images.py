@@ -0,0 +1,101 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from PIL import Image, features
+
+from api.cache import bump_recipes_generation
+from api.models import Recipe
+from api.storage import recipe_images
+
+RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+RENDITIONS_DIR = 'renditions'
+QUALITY = 80
+
+
+def rendition_format():
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def encode(image, size):
+    image_format, _ = rendition_format()
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' or copy.mode not in ('RGB', 'RGBA'):
+        copy = copy.convert('RGBA' if image_format == 'WEBP' else 'RGB')
+    buffer = BytesIO()
+    copy.save(buffer, image_format, quality=QUALITY)
+    return buffer.getvalue()
+
+
+def make_renditions(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'images'
+    ).first()
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    _, extension = rendition_format()
+    with recipe_images.open(source) as image_file:
+        image = Image.open(image_file)
+        image.load()
+    names = {
+        name: recipe_images.save(
+            f'{RENDITIONS_DIR}/{name}.{extension}',
+            ContentFile(encode(image, size))
+        ) for name, size in RENDITIONS.items()
+    }
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        images=names
+    )
+    if updated:
+        bump_recipes_generation()
+        release_files(set(recipe.images.values()) - set(names.values()))
+    else:
+        release_files(names.values())
+
+
+def referenced_files(names):
+    names = set(names)
+    condition = Q(image__in=names)
+    for rendition in RENDITIONS:
+        condition |= Q(**{f'images__{rendition}__in': names})
+    found = set()
+    for image, images in Recipe.objects.filter(condition).values_list(
+        'image', 'images'
+    ):
+        found.add(image)
+        found.update(images.values())
+    return found & names
+
+
+def release_files(names):
+    """Удаляет файлы, на которые больше не ссылается ни один рецепт.
+
+    Файлы, повторно использованные за последние REUSE_GRACE секунд,
+    остаются: их заберёт collect_media_garbage.
+    """
+    names = {name for name in names if name}
+    for name in names - referenced_files(names):
+        if not recipe_images.is_recent(name):
+            recipe_images.delete(name)
+
+
+def rendition_urls(recipe, request=None):
+    if not recipe.image:
+        return dict.fromkeys(RENDITIONS)
+    urls = {
+        name: recipe_images.url(recipe.images[name])
+        if name in recipe.images else recipe.image.url
+        for name in RENDITIONS
+    }
+    if request is not None:
+        urls = {
+            name: request.build_absolute_uri(url)
+            for name, url in urls.items()
+        }
+    return urls
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время загрузки синтетического каталога ингредиентов '
+        'командами loaddata и import_ingredients. Каждый прогон '
+        'выполняется в транзакции и откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, **options):
+        rows = [
+            (f'ингредиент для замера {number}', 'г')
+            for number in range(options['rows'])
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            fixture = os.path.join(directory, 'ingredients.json')
+            with open(fixture, 'w', encoding='utf-8') as target:
+                json.dump([
+                    {
+                        'model': 'api.ingredient',
+                        'fields': {'name': name, 'measurement_unit': unit}
+                    } for name, unit in rows
+                ], target, ensure_ascii=False)
+            source = os.path.join(directory, 'ingredients.csv')
+            with open(source, 'w', encoding='utf-8', newline='') as target:
+                csv.writer(target).writerows(rows)
+            results = {
+                'loaddata': self.measure('loaddata', fixture),
+                'import_ingredients (json)': self.measure(
+                    'import_ingredients', fixture
+                ),
+                'import_ingredients (csv)': self.measure(
+                    'import_ingredients', source
+                ),
+            }
+        for name, seconds in results.items():
+            self.stdout.write(
+                f'{name}: {seconds:.2f} с, '
+                f'{options["rows"] / seconds:.0f} строк/с'
+            )
+
+    def measure(self, command, path):
+        with transaction.atomic():
+            started = time.perf_counter()
+            call_command(command, path, verbosity=0, stdout=io.StringIO())
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed
@@ -0,0 +1,260 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.seed_data import USERNAME_PREFIX
+from api.models import (FavorRecipe, FeedEntry, Ingredient, Recipe,
+                        ShoppingList)
+from api.search import search_recipes
+from users.models import Follow, User
+
+SCENARIOS = (
+    ('recipes_anon', False, '/api/recipes/?page={page}'),
+    ('recipes_auth', True, '/api/recipes/?page={page}'),
+    (
+        'recipes_tags_anon', False,
+        '/api/recipes/?page={page}&tags=breakfast&tags=dinner'
+    ),
+    (
+        'recipes_tags_auth', True,
+        '/api/recipes/?page={page}&tags=breakfast&tags=dinner'
+    ),
+    ('subscriptions', True, '/api/users/subscriptions/?recipes_limit=3'),
+    ('ingredients_search', False, '/api/ingredients/?name={prefix}'),
+    ('recipes_search', False, '/api/recipes/?search={word}'),
+    ('pantry', False, '/api/recipes/pantry/?{pantry}'),
+    (
+        'download_shopping_cart', True,
+        '/api/recipes/download_shopping_cart/?format=txt'
+    ),
+)
+PAGES = 10
+PANTRY_SIZE = 8
+
+
+def hot_queries(user, author, recipe):
+    """Запросы горячих путей и таблицы, которые они не должны сканировать."""
+    queries = {
+        'favorite_exists': (
+            FavorRecipe.objects.filter(author=user, recipes=recipe),
+            ('api_favorrecipe', )
+        ),
+        'cart_exists': (
+            ShoppingList.objects.filter(author=user, recipes=recipe),
+            ('api_shoppinglist', )
+        ),
+        'follow_exists': (
+            Follow.objects.filter(user=user, author=author),
+            ('users_follow', )
+        ),
+        'recipes_by_author': (
+            Recipe.objects.filter(author=author).order_by('-pk')[:6],
+            ('api_recipe', )
+        ),
+        'recipes_by_tag': (
+            Recipe.tags.through.objects.filter(
+                tag__slug='breakfast'
+            ).values('recipe_id'),
+            ('api_recipe_tags', 'api_tag')
+        ),
+        'subscription_previews': (
+            Recipe.objects.previews([author], 3), ('api_recipe', )
+        ),
+        'feed_timeline': (
+            FeedEntry.objects.timeline(user)[:6],
+            ('api_feedentry', )
+        ),
+    }
+    if connection.vendor == 'postgresql':
+        queries['ingredient_search'] = (
+            Ingredient.objects.filter(name__icontains='абр'),
+            ('api_ingredient', )
+        )
+        queries['recipe_search'] = (
+            search_recipes(Recipe.objects.all(), 'соль'), ('api_recipe', )
+        )
+    return queries
+
+
+def full_scans(plan, tables):
+    if connection.vendor == 'postgresql':
+        return [table for table in tables if f'Seq Scan on {table}' in plan]
+    return [
+        table for table in tables for line in plan.splitlines()
+        if f'SCAN {table}' in line and 'USING' not in line
+    ]
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность, p50/p99 и число SQL-запросов '
+        'основных эндпоинтов на данных seed_data и сохраняет результат '
+        'в JSON; с --compare показывает изменения относительно прошлого '
+        'прогона.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--label', default='')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument('--compare', help='JSON прошлого прогона')
+        parser.add_argument(
+            '--only', nargs='+', choices=[name for name, *_ in SCENARIOS]
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Проверить через EXPLAIN, что горячие запросы идут по индексам'
+        )
+
+    def handle(self, **options):
+        user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').first()
+        if user is None:
+            raise CommandError('Сначала выполните manage.py seed_data')
+        token, _ = Token.objects.get_or_create(user=user)
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        clients = {
+            False: Client(HTTP_HOST=host),
+            True: Client(
+                HTTP_HOST=host, HTTP_AUTHORIZATION=f'Token {token.key}'
+            ),
+        }
+        names = list(Ingredient.objects.values_list('name', flat=True)[:500])
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('pk', flat=True)[:500]
+        )
+        self.random = random.Random(options['seed'])
+        results = {}
+        for name, authorized, template in SCENARIOS:
+            if options['only'] and name not in options['only']:
+                continue
+            results[name] = self.measure(
+                clients[authorized], template, names, options
+            )
+            self.report(name, results[name])
+        data = {
+            'explain': self.explain(user) if options['explain'] else None,
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                json.dump(data, target, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(options['compare'], results)
+        if data['explain'] and not all(
+            item['uses_index'] for item in data['explain'].values()
+        ):
+            raise CommandError('Есть запросы без индексов, см. EXPLAIN выше')
+
+    def explain(self, user):
+        author = Follow.objects.filter(user=user).values_list(
+            'author', flat=True
+        ).first() or user.pk
+        recipe = Recipe.objects.values_list('pk', flat=True).first() or 1
+        checks = {}
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, (queryset, tables) in hot_queries(
+                user, author, recipe
+            ).items():
+                plan = queryset.explain()
+                scanned = full_scans(plan, tables)
+                checks[name] = {'uses_index': not scanned, 'plan': plan}
+                self.stdout.write(
+                    f'EXPLAIN {name}: ' + (
+                        f'полное сканирование {", ".join(scanned)}'
+                        if scanned else 'индекс'
+                    )
+                )
+                if scanned:
+                    self.stdout.write(plan)
+        return checks
+
+    def url(self, template, names):
+        return template.format(
+            page=self.random.randint(1, PAGES),
+            prefix=self.random.choice(names)[:self.random.randint(2, 4)],
+            word=self.random.choice(names).split()[0],
+            pantry='&'.join(
+                f'ingredients={pk}' for pk in self.random.sample(
+                    self.ingredient_ids,
+                    min(PANTRY_SIZE, len(self.ingredient_ids))
+                )
+            )
+        )
+
+    def measure(self, client, template, names, options):
+        for _ in range(options['warmup']):
+            client.get(self.url(template, names))
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            url = self.url(template, names)
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append(
+                    (time.perf_counter() - request_started) * 1000
+                )
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries.append(len(captured))
+        elapsed = time.perf_counter() - started
+        return {
+            'rps': round(options['requests'] / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:24} {result["rps"]:8.1f} rps  '
+            f'p50 {result["p50_ms"]:8.2f} мс  p99 {result["p99_ms"]:8.2f} мс  '
+            f'запросов {result["queries_mean"]:.1f} (макс. '
+            f'{result["queries_max"]})'
+        )
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as source:
+            previous = json.load(source)['results']
+        self.stdout.write(f'Изменения относительно {path}:')
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            changes = ', '.join(
+                f'{field} {previous[name][field]} → {result[field]} '
+                f'({(result[field] / previous[name][field] - 1) * 100:+.0f}%)'
+                if previous[name][field] else
+                f'{field} {previous[name][field]} → {result[field]}'
+                for field in result
+            )
+            self.stdout.write(f'{name}: {changes}')
@@ -0,0 +1,206 @@
+import json
+import os
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.benchmark import PAGES, percentile
+from api.management.commands.seed_data import USERNAME_PREFIX
+from api.models import Ingredient, Recipe
+from users.models import User
+
+SERVERS = {
+    'wsgi': ('foodgram.wsgi:application', ),
+    'asgi': (
+        'foodgram.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'
+    ),
+}
+READ_SCENARIOS = (
+    ('recipes', False, '/api/recipes/?page={page}'),
+    ('recipe', False, '/api/recipes/{recipe}/'),
+    ('tags', False, '/api/tags/'),
+    ('ingredients', False, '/api/ingredients/?name={prefix}'),
+    ('subscriptions', True, '/api/users/subscriptions/?recipes_limit=3'),
+)
+SLOW_SCENARIO = (
+    'shopping_list', True, '/api/recipes/download_shopping_cart/?format=pdf'
+)
+START_TIMEOUT = 30
+REQUEST_TIMEOUT = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает gunicorn с синхронными воркерами и ASGI-режим '
+        '(gunicorn + uvicorn) под одинаковой конкурентной нагрузкой: '
+        'чтение основных эндпоинтов вперемешку с медленными выгрузками '
+        'списка покупок. Выводит rps, p50/p99 и p99 только чтений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--duration', type=float, default=15,
+            help='Длительность нагрузки на каждый сервер, секунд'
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--slow-share', type=float, default=0.1,
+            help='Доля запросов на выгрузку списка покупок в PDF'
+        )
+        parser.add_argument('--port', type=int, default=8101)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--modes', nargs='+', choices=list(SERVERS),
+            default=list(SERVERS)
+        )
+        parser.add_argument(
+            '--wsgi-url', help='Уже запущенный WSGI-сервер вместо нового'
+        )
+        parser.add_argument(
+            '--asgi-url', help='Уже запущенный ASGI-сервер вместо нового'
+        )
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, **options):
+        user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').first()
+        if user is None:
+            raise CommandError('Сначала выполните manage.py seed_data')
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        self.host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        self.recipes = list(
+            Recipe.objects.values_list('pk', flat=True)[:500]
+        )
+        self.names = list(
+            Ingredient.objects.values_list('name', flat=True)[:500]
+        )
+        results = {}
+        for mode in options['modes']:
+            url = options[f'{mode}_url']
+            server = None
+            if not url:
+                url = f'http://127.0.0.1:{options["port"]}'
+                server = self.start(mode, options)
+            try:
+                self.wait(url, server)
+                results[mode] = self.load(url, options)
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.wait()
+            self.report(mode, results[mode])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                json.dump({
+                    'concurrency': options['concurrency'],
+                    'workers': options['workers'],
+                    'slow_share': options['slow_share'],
+                    'results': results,
+                }, target, ensure_ascii=False, indent=2)
+
+    def start(self, mode, options):
+        try:
+            return subprocess.Popen(
+                [
+                    'gunicorn', *SERVERS[mode],
+                    '--workers', str(options['workers']),
+                    '--bind', f'127.0.0.1:{options["port"]}',
+                ],
+                cwd=settings.BASE_DIR, env=os.environ.copy(),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            raise CommandError('gunicorn не установлен')
+
+    def wait(self, url, server):
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if server is not None and server.poll() is not None:
+                raise CommandError(
+                    f'Сервер завершился с кодом {server.returncode}'
+                )
+            try:
+                self.fetch(url, '/api/tags/', False)
+                return
+            except (URLError, ConnectionError):
+                time.sleep(0.2)
+        raise CommandError(f'{url} не ответил за {START_TIMEOUT} с')
+
+    def fetch(self, base, path, authorized):
+        request = Request(base + path, headers={'Host': self.host})
+        if authorized:
+            request.add_header('Authorization', f'Token {self.token}')
+        with urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            response.read()
+            return response.status
+
+    def load(self, url, options):
+        deadline = time.monotonic() + options['duration']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            samples = [
+                sample
+                for worker in executor.map(
+                    lambda number: self.client(
+                        url, deadline, options,
+                        random.Random(options['seed'] + number)
+                    ), range(options['concurrency'])
+                ) for sample in worker
+            ]
+        elapsed = time.perf_counter() - started
+        latencies = [latency for _, latency, _ in samples]
+        reads = [
+            latency for name, latency, _ in samples
+            if name != SLOW_SCENARIO[0]
+        ]
+        return {
+            'requests': len(samples),
+            'errors': sum(not ok for *_, ok in samples),
+            'rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'reads_p99_ms': round(percentile(reads, 0.99), 2),
+            'max_ms': round(max(latencies), 2),
+        }
+
+    def client(self, url, deadline, options, generator):
+        samples = []
+        while time.monotonic() < deadline:
+            if generator.random() < options['slow_share']:
+                name, authorized, template = SLOW_SCENARIO
+            else:
+                name, authorized, template = generator.choice(READ_SCENARIOS)
+            path = template.format(
+                page=generator.randint(1, PAGES),
+                recipe=generator.choice(self.recipes),
+                prefix=quote(generator.choice(self.names)[:3])
+            )
+            started = time.perf_counter()
+            try:
+                ok = self.fetch(url, path, authorized) == 200
+            except (HTTPError, URLError, ConnectionError, TimeoutError):
+                ok = False
+            samples.append((name, (time.perf_counter() - started) * 1000, ok))
+        return samples
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'{mode}: {result["rps"]:8.1f} rps  p50 {result["p50_ms"]:8.2f} мс'
+            f'  p99 {result["p99_ms"]:8.2f} мс  p99 чтений '
+            f'{result["reads_p99_ms"]:8.2f} мс  '
+            f'макс. {result["max_ms"]:.0f} мс  '
+            f'ошибок {result["errors"]} из {result["requests"]}'
+        )
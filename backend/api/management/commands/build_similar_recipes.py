@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.similarity import SIMILAR_COUNT, build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает MinHash-корзины и списки похожих рецептов '
+        'по ингредиентам и тэгам. Правки отдельных рецептов применяются '
+        'сразу, команда нужна для первичного заполнения и периодической '
+        'полной сверки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=SIMILAR_COUNT,
+            help='Сколько похожих рецептов хранить для каждого'
+        )
+
+    def handle(self, **options):
+        recipes, rows = build_similar_recipes(options['count'])
+        self.stdout.write(
+            f'Рецептов: {recipes}, пар похожих рецептов: {rows}'
+        )
@@ -0,0 +1,56 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.images import RENDITIONS_DIR
+from api.models import Recipe
+from api.storage import recipe_images
+
+MEDIA_DIRS = (Recipe._meta.get_field('image').upload_to, RENDITIONS_DIR)
+
+
+def walk(directory):
+    if not recipe_images.exists(directory):
+        return
+    directories, files = recipe_images.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name).replace('\\', '/')
+    for name in directories:
+        yield from walk(os.path.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки рецептов и их копии, на которые не ссылается '
+        'ни один рецепт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=24 * 60 * 60,
+            help='Не трогать файлы моложе указанного числа секунд'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, **options):
+        referenced = set()
+        for image, images in Recipe.objects.values_list(
+            'image', 'images'
+        ).iterator():
+            referenced.add(image)
+            referenced.update(images.values())
+        oldest = time.time() - options['min_age']
+        removed = size = 0
+        for directory in MEDIA_DIRS:
+            for name in walk(directory.rstrip('/')):
+                path = recipe_images.path(name)
+                if name in referenced or os.path.getmtime(path) > oldest:
+                    continue
+                removed += 1
+                size += os.path.getsize(path)
+                if not options['dry_run']:
+                    recipe_images.delete(name)
+        self.stdout.write(
+            f'Удалено файлов: {removed}, освобождено: {size // 1024} КБ'
+        )
@@ -0,0 +1,55 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import bump_recipes_generation
+from api.models import FavorRecipe, ShoppingList, TrendingRecipe
+
+ACTIVITY_WEIGHTS = ((FavorRecipe, 1.0), (ShoppingList, 2.0))
+HALF_LIFE_HOURS = 72
+HALF_LIVES_WINDOW = 10
+TRENDING_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает таблицу популярных рецептов. Каждое добавление '
+        'в избранное или корзину даёт вклад, который убывает вдвое '
+        'за --half-life часов. Запускать периодически, например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life', type=float, default=HALF_LIFE_HOURS,
+            help='Период полураспада вклада в часах'
+        )
+        parser.add_argument('--size', type=int, default=TRENDING_SIZE)
+
+    def handle(self, **options):
+        now = timezone.now()
+        half_life = options['half_life'] * 3600
+        since = now - timedelta(seconds=half_life * HALF_LIVES_WINDOW)
+        scores = defaultdict(float)
+        for model, weight in ACTIVITY_WEIGHTS:
+            activity = model.objects.filter(
+                created__gte=since, recipes__isnull=False
+            ).order_by().values_list('recipes_id', 'created')
+            for recipe_id, created in activity.iterator():
+                age = (now - created).total_seconds()
+                scores[recipe_id] += weight * 0.5 ** (age / half_life)
+        top = heapq.nlargest(
+            options['size'], scores.items(),
+            key=lambda item: (item[1], item[0])
+        )
+        with transaction.atomic():
+            TrendingRecipe.objects.all().delete()
+            TrendingRecipe.objects.bulk_create(
+                TrendingRecipe(recipe_id=recipe_id, score=score, rank=rank)
+                for rank, (recipe_id, score) in enumerate(top, 1)
+            )
+        bump_recipes_generation()
+        self.stdout.write(f'Популярных рецептов: {len(top)}')
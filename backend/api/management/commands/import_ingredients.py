@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import ingredients
+from api.models import Ingredient
+
+JSON_CHUNK_SIZE = 64 * 1024
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as source:
+        for row in csv.reader(source):
+            if row[:2] == ['name', 'measurement_unit']:
+                continue
+            yield tuple(row[:2]) if len(row) >= 2 else None
+
+
+def read_json(path):
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as source:
+        buffer = source.read(JSON_CHUNK_SIZE).lstrip().lstrip('[')
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = source.read(JSON_CHUNK_SIZE)
+                if not chunk:
+                    if buffer:
+                        raise CommandError('Некорректный JSON в %s' % path)
+                    return
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            fields = item.get('fields', item)
+            yield fields.get('name'), fields.get('measurement_unit')
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV (name,measurement_unit) или JSON '
+        '(фикстура либо список объектов) пакетами, пропуская уже '
+        'существующие пары (name, measurement_unit).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='По умолчанию определяется по расширению файла'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='По умолчанию 5000 для PostgreSQL и 500 для остальных СУБД'
+        )
+
+    def handle(self, path, **options):
+        if not os.path.exists(path):
+            raise CommandError('Файл %s не найден' % path)
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        readers = {'csv': read_csv, 'json': read_json}
+        if file_format not in readers:
+            raise CommandError('Неизвестный формат %s' % file_format)
+        self.stats = dict.fromkeys(
+            ('inserted', 'existing', 'duplicates', 'skipped'), 0
+        )
+        rows = self.unique_rows(readers[file_format](path))
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                self.copy_rows(rows, options['batch_size'] or 5000)
+            else:
+                self.insert_rows(rows, options['batch_size'] or 500)
+        ingredients.invalidate()
+        self.stdout.write(
+            'Добавлено: {inserted}, уже были в базе: {existing}, '
+            'повторы в файле: {duplicates}, пропущено: {skipped}'.format(
+                **self.stats
+            )
+        )
+
+    def unique_rows(self, rows):
+        seen = set()
+        for row in rows:
+            name, unit = (
+                (value or '').strip() for value in row
+            ) if row else ('', '')
+            if (not name or not unit or len(name) > NAME_LENGTH or
+                    len(unit) > UNIT_LENGTH):
+                self.stats['skipped'] += 1
+                continue
+            if (name, unit) in seen:
+                self.stats['duplicates'] += 1
+                continue
+            seen.add((name, unit))
+            yield name, unit
+
+    def insert_rows(self, rows, batch_size):
+        batch = list(islice(rows, batch_size))
+        while batch:
+            existing = set(Ingredient.objects.filter(
+                name__in={name for name, _ in batch}
+            ).values_list('name', 'measurement_unit'))
+            created = [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in batch if (name, unit) not in existing
+            ]
+            Ingredient.objects.bulk_create(created, ignore_conflicts=True)
+            self.stats['inserted'] += len(created)
+            self.stats['existing'] += len(batch) - len(created)
+            batch = list(islice(rows, batch_size))
+
+    def copy_rows(self, rows, batch_size):
+        table = Ingredient._meta.db_table
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name varchar(%s), measurement_unit varchar(%s)) '
+                'ON COMMIT DROP' % (NAME_LENGTH, UNIT_LENGTH)
+            )
+            batch = list(islice(rows, batch_size))
+            while batch:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer
+                )
+                total += len(batch)
+                batch = list(islice(rows, batch_size))
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM ingredient_import '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            self.stats['inserted'] = cursor.rowcount
+        self.stats['existing'] = total - self.stats['inserted']
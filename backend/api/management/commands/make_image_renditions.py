@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.images import make_renditions
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт уменьшенные копии картинок рецептов, для которых их нет, '
+        'например если процесс перезапустился до завершения фоновой задачи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии для всех рецептов с картинкой'
+        )
+
+    def handle(self, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.filter(images={})
+        count = 0
+        for pk in recipes.values_list('pk', flat=True).iterator():
+            make_renditions(pk)
+            count += 1
+        self.stdout.write(f'Обработано рецептов: {count}')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.models import ShoppingListIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает ShoppingListIngredient заново по корзинам '
+        'ShoppingList, если накопленные итоги разошлись с рецептами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, nargs='+', dest='users',
+            help='id пользователей; по умолчанию все'
+        )
+
+    def handle(self, **options):
+        rows = ShoppingListIngredient.objects.rebuild(options['users'])
+        self.stdout.write(f'Строк в списках покупок: {rows}')
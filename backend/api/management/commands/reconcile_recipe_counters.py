@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from api.cache import bump_recipes_generation
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики favorites_count и in_carts_count рецептов '
+        'с фактическим числом записей в избранном и корзинах и '
+        'исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число рецептов с расхождениями'
+        )
+
+    def handle(self, **options):
+        with transaction.atomic():
+            drifted = Recipe.objects.with_actual_counters().filter(
+                ~Q(favorites_count=F('actual_favorites_count')) |
+                ~Q(in_carts_count=F('actual_in_carts_count'))
+            ).select_for_update().values_list(
+                'pk', 'actual_favorites_count', 'actual_in_carts_count'
+            )
+            drifted = list(drifted)
+            if not options['dry_run']:
+                Recipe.objects.bulk_update([
+                    Recipe(
+                        pk=pk, favorites_count=favorites,
+                        in_carts_count=in_carts
+                    ) for pk, favorites, in_carts in drifted
+                ], ['favorites_count', 'in_carts_count'], batch_size=500)
+        if drifted and not options['dry_run']:
+            bump_recipes_generation()
+        self.stdout.write(f'Рецептов с расхождениями: {len(drifted)}')
@@ -0,0 +1,185 @@
+import os
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from api.cache import bump_recipes_generation, ingredients
+from api.pantry import pantry_index
+from api.search import tag_index, update_search_vectors
+from api.models import (FavorRecipe, FeedEntry, Ingredient, Recipe,
+                        RecipeComponent, ShoppingList, ShoppingListIngredient,
+                        Tag)
+from users.models import Follow, User
+
+USERNAME_PREFIX = 'bench_user_'
+PASSWORD = 'bench-password'
+BATCH_SIZE = 1000
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочных замеров: '
+        'пользователи bench_user_N, рецепты с ингредиентами из '
+        'data/ingredients.csv, подписки, избранное и корзины.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Подписок на пользователя'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=30,
+            help='Рецептов в избранном у пользователя'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=10,
+            help='Рецептов в корзине у пользователя'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ранее созданных пользователей bench_user_N'
+        )
+
+    def handle(self, **options):
+        existing = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        if existing.exists():
+            if not options['clear']:
+                raise CommandError(
+                    'Данные уже созданы, используйте --clear для пересоздания'
+                )
+            existing.delete()
+        if not Ingredient.objects.exists():
+            call_command(
+                'import_ingredients', options['ingredients'],
+                stdout=self.stdout
+            )
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            recipes = self.create_recipes(users, options['recipes'])
+            self.create_follows(users, options['follows'])
+            self.create_marks(FavorRecipe, users, recipes, options['favorites'])
+            self.create_marks(ShoppingList, users, recipes, options['carts'])
+            self.fill_shopping_totals()
+            self.fill_feeds()
+            update_search_vectors(recipes)
+        call_command('reconcile_recipe_counters', stdout=self.stdout)
+        call_command('compute_trending', stdout=self.stdout)
+        call_command('build_similar_recipes', stdout=self.stdout)
+        ingredients.invalidate()
+        tag_index.invalidate()
+        pantry_index.invalidate()
+        bump_recipes_generation()
+        self.stdout.write(
+            f'Пользователей: {len(users)}, рецептов: {len(recipes)}. '
+            f'Пароль: {PASSWORD}'
+        )
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create((
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@example.com',
+                first_name='Тест', last_name=str(number), password=password
+            ) for number in range(count)
+        ), batch_size=BATCH_SIZE)
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_recipes(self, users, count):
+        tags = [
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )[0].pk for name, color, slug in TAGS
+        ]
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        authors = self.random.choices(
+            users, weights=[1 / (rank + 1) for rank in range(len(users))],
+            k=count
+        )
+        Recipe.objects.bulk_create((
+            Recipe(
+                author_id=author, name=f'Рецепт {number}',
+                text='Синтетический рецепт для нагрузочных замеров.',
+                cooking_time=self.random.randint(5, 180)
+            ) for number, author in enumerate(authors)
+        ), batch_size=BATCH_SIZE)
+        recipes = list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX
+        ).values_list('pk', flat=True))
+        components, recipe_tags = [], []
+        for recipe in recipes:
+            size = round(self.random.triangular(3, 20, 8))
+            components.extend(
+                RecipeComponent(
+                    recipe_id=recipe, ingredient_id=ingredient,
+                    amount=self.random.randint(1, 500)
+                ) for ingredient in self.random.sample(ingredient_ids, size)
+            )
+            recipe_tags.extend(
+                Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+                for tag in self.random.sample(
+                    tags, self.random.randint(1, len(tags))
+                )
+            )
+        RecipeComponent.objects.bulk_create(components, batch_size=BATCH_SIZE)
+        Recipe.tags.through.objects.bulk_create(
+            recipe_tags, batch_size=BATCH_SIZE
+        )
+        return recipes
+
+    def create_follows(self, users, count):
+        Follow.objects.bulk_create((
+            Follow(user_id=user, author_id=author)
+            for user in users
+            for author in self.random.sample(users, min(count, len(users)))
+            if author != user
+        ), batch_size=BATCH_SIZE)
+
+    def create_marks(self, model, users, recipes, count):
+        model.objects.bulk_create((
+            model(author_id=user, recipes_id=recipe)
+            for user in users
+            for recipe in self.random.sample(
+                recipes, min(count, len(recipes))
+            )
+        ), batch_size=BATCH_SIZE)
+
+    def fill_shopping_totals(self):
+        totals = RecipeComponent.objects.filter(
+            recipe__shop_list__author__username__startswith=USERNAME_PREFIX
+        ).values('recipe__shop_list__author', 'ingredient').annotate(
+            total=Sum('amount')
+        ).order_by()
+        ShoppingListIngredient.objects.bulk_create((
+            ShoppingListIngredient(
+                author_id=item['recipe__shop_list__author'],
+                ingredient_id=item['ingredient'], amount=item['total']
+            ) for item in totals
+        ), batch_size=BATCH_SIZE)
+
+    def fill_feeds(self):
+        for user, author in Follow.objects.filter(
+            user__username__startswith=USERNAME_PREFIX
+        ).values_list('user', 'author'):
+            FeedEntry.objects.backfill(User(pk=user), author)
@@ -0,0 +1,55 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_shopping_totals(apps, schema_editor):
+    RecipeComponent = apps.get_model('api', 'RecipeComponent')
+    ShoppingListIngredient = apps.get_model('api', 'ShoppingListIngredient')
+    totals = RecipeComponent.objects.filter(
+        recipe__shop_list__isnull=False
+    ).values('recipe__shop_list__author', 'ingredient').annotate(
+        total=Sum('amount')
+    ).order_by()
+    ShoppingListIngredient.objects.bulk_create(
+        ShoppingListIngredient(
+            author_id=item['recipe__shop_list__author'],
+            ingredient_id=item['ingredient'],
+            amount=item['total']
+        ) for item in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0003_auto_20210926_1437'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListIngredient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_totals', to='api.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Ингредиенты в списке покупок',
+                'ordering': ('ingredient',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistingredient',
+            constraint=models.UniqueConstraint(fields=('author', 'ingredient'), name='shopping_author_unique_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shopping_totals, migrations.RunPython.noop
+        ),
+    ]
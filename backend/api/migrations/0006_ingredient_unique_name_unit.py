@@ -0,0 +1,49 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:26
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('api', 'Ingredient')
+    RecipeComponent = apps.get_model('api', 'RecipeComponent')
+    ShoppingListIngredient = apps.get_model('api', 'ShoppingListIngredient')
+    groups = Ingredient.objects.values('name', 'measurement_unit').annotate(
+        keep=Min('pk'), total=Count('pk')
+    ).filter(total__gt=1).order_by()
+    for group in groups:
+        duplicates = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(pk=group['keep'])
+        for model, owner in ((RecipeComponent, 'recipe'),
+                             (ShoppingListIngredient, 'author')):
+            for row in model.objects.filter(ingredient__in=duplicates):
+                kept = model.objects.filter(**{
+                    'ingredient_id': group['keep'],
+                    f'{owner}_id': getattr(row, f'{owner}_id')
+                }).first()
+                if kept is None:
+                    row.ingredient_id = group['keep']
+                    row.save(update_fields=['ingredient'])
+                    continue
+                kept.amount += row.amount
+                kept.save(update_fields=['amount'])
+                row.delete()
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_ingredient_name_trigram'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='ingredient_unique_name_unit'),
+        ),
+    ]
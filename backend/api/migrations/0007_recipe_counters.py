@@ -0,0 +1,43 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipe_counters(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+
+    def count(model_name):
+        model = apps.get_model('api', model_name)
+        return Coalesce(Subquery(model.objects.filter(
+            recipes=OuterRef('pk')
+        ).order_by().values('recipes').annotate(
+            count=Count('pk')
+        ).values('count')), 0)
+
+    Recipe.objects.update(
+        favorites_count=count('FavorRecipe'),
+        in_carts_count=count('ShoppingList')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunPython(fill_recipe_counters, migrations.RunPython.noop),
+    ]
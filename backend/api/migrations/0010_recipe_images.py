@@ -0,0 +1,18 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_feed_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='images',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Уменьшенные копии картинки'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:35
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_recipe_images'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=api.storage.ContentHashStorage(), upload_to='media/', verbose_name='Картинка рецепта'),
+        ),
+    ]
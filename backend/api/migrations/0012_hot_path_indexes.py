@@ -0,0 +1,40 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+TAG_INDEX = 'api_recipe_tags_tag_recipe'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favorrecipe',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления'),
+        ),
+        migrations.AddIndex(
+            model_name='favorrecipe',
+            index=models.Index(condition=models.Q(recipes__isnull=False), fields=['created'], name='favorite_recipe_created'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipe_author_id_desc'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_desc'),
+        ),
+        migrations.RunSQL(
+            f'CREATE INDEX {TAG_INDEX} ON api_recipe_tags (tag_id, recipe_id)',
+            f'DROP INDEX {TAG_INDEX}'
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:45
+
+import api.fields
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'api_recipe_search_vector'
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "UPDATE api_recipe SET search_vector = "
+        "setweight(to_tsvector(%s::regconfig, coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector(%s::regconfig, coalesce(("
+        "SELECT string_agg(ingredient.name, ' ') "
+        "FROM api_recipecomponent component "
+        "JOIN api_ingredient ingredient "
+        "ON ingredient.id = component.ingredient_id "
+        "WHERE component.recipe_id = api_recipe.id), '')), 'B') || "
+        "setweight(to_tsvector(%s::regconfig, coalesce(text, '')), 'C')",
+        (settings.SEARCH_CONFIG, ) * 3
+    )
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON api_recipe '
+        f'USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=api.fields.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(fill_search_vectors, drop_search_index),
+    ]
@@ -1,8 +1,17 @@
-from django.db import models
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
-from django.db.models import Exists, F, OuterRef, Sum, Value
+from django.db.models import (Count, Exists, F, OuterRef, Subquery, Sum,
+                              Value, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest, RowNumber
 
-from users.models import User
+from api.fields import SearchVectorField
+from api.storage import recipe_images
+from api.versions import drop_shopping_list_versions
+from users.models import Follow, User
 
 
 class RecipeQuerySet(models.QuerySet):
@@ -15,6 +24,9 @@ class RecipeQuerySet(models.QuerySet):
                 ),
                 is_in_shopping_cart=Value(
                     False, output_field=models.BooleanField()
+                ),
+                author_is_subscribed=Value(
+                    False, output_field=models.BooleanField()
                 )
             )
         return self.annotate(
@@ -23,9 +35,58 @@ class RecipeQuerySet(models.QuerySet):
             )),
             is_in_shopping_cart=Exists(ShoppingList.objects.filter(
                 author=user, recipes_id=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user, author_id=OuterRef('author_id')
             ))
         )
 
+    def previews(self, author_ids, limit=None):
+        queryset = self.filter(author_id__in=author_ids)
+        if limit is None:
+            return queryset
+        ranked = queryset.annotate(preview_rank=Window(
+            RowNumber(), partition_by=F('author_id'), order_by=F('pk').desc()
+        )).order_by().values('pk', 'preview_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE preview_rank <= %s',
+            (*params, limit)
+        ))
+
+    def lock(self, pk):
+        """Блокирует строку рецепта до конца транзакции.
+
+        Правка состава, удаление рецепта и изменение корзины берут эту
+        блокировку до чтения ингредиентов, поэтому ShoppingListIngredient
+        меняется по одному и тому же составу.
+        """
+        list(self.select_for_update().filter(pk=pk).values_list('pk'))
+
+    def change_counter(self, pk, field, delta):
+        queryset = self.filter(pk=pk)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        return queryset.update(**{field: F(field) + delta})
+
+    def trending(self):
+        return self.filter(trending__isnull=False).annotate(
+            trending_rank=F('trending__rank')
+        ).order_by('trending_rank')
+
+    def with_actual_counters(self):
+        def count(model):
+            return Coalesce(Subquery(model.objects.filter(
+                recipes=OuterRef('pk')
+            ).order_by().values('recipes').annotate(
+                count=Count('pk')
+            ).values('count')), 0)
+
+        return self.annotate(
+            actual_favorites_count=count(FavorRecipe),
+            actual_in_carts_count=count(ShoppingList)
+        )
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -41,6 +102,12 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('pk', )
+        constraints = [
+            models.UniqueConstraint(
+                name='ingredient_unique_name_unit',
+                fields=['name', 'measurement_unit']
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
@@ -75,9 +142,16 @@ class Recipe(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название')
     image = models.ImageField(
         upload_to='media/',
+        storage=recipe_images,
         blank=True, null=True,
         verbose_name='Картинка рецепта'
     )
+    images = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии картинки'
+    )
     author = models.ForeignKey(
         User,
         related_name='recipes',
@@ -111,6 +185,21 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     objects = RecipeQuerySet.as_manager()
 
@@ -118,10 +207,24 @@ class Recipe(models.Model):
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pk', )
+        indexes = [
+            models.Index(
+                name='recipe_author_id_desc', fields=['author', '-id']
+            ),
+            models.Index(
+                name='recipe_author_pub_date', fields=['author', '-pub_date']
+            ),
+            models.Index(
+                name='recipe_pub_date_id_desc', fields=['-pub_date', '-id']
+            ),
+        ]
 
     def __str__(self):
         return self.name[:32]
 
+    def component_amounts(self):
+        return dict(self.component_recipes.values_list('ingredient', 'amount'))
+
 
 class ShoppingList(models.Model):
     recipes = models.ForeignKey(
@@ -136,6 +239,11 @@ class ShoppingList(models.Model):
         verbose_name='Пользователь',
         related_name='author'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         verbose_name = 'Рецепт в корзине'
@@ -166,6 +274,10 @@ class FavorRecipe(models.Model):
         related_name='user_favorites',
         verbose_name='Пользователь'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -176,12 +288,224 @@ class FavorRecipe(models.Model):
                 fields=['author', 'recipes']
             )
         ]
+        indexes = [
+            models.Index(
+                name='favorite_recipe_created',
+                fields=['created'],
+                condition=models.Q(recipes__isnull=False)
+            )
+        ]
         ordering = ('-pk', )
 
     def __str__(self):
         return f'{self.recipes.name} в избранном у {self.author.username}'
 
 
+class TrendingRecipe(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField(verbose_name='Рейтинг')
+    rank = models.PositiveIntegerField(unique=True, verbose_name='Место')
+
+    class Meta:
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+        ordering = ('rank', )
+
+    def __str__(self):
+        return f'{self.rank}. {self.recipe.name}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_entries',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', 'rank')
+        constraints = [
+            models.UniqueConstraint(
+                name='similar_recipe_unique_rank',
+                fields=['recipe', 'rank']
+            ),
+            models.UniqueConstraint(
+                name='similar_recipe_unique_similar',
+                fields=['recipe', 'similar']
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.similar.name} похож на {self.recipe.name}'
+
+
+class SimilarityBucket(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarity_buckets',
+        verbose_name='Рецепт'
+    )
+    key = models.BigIntegerField(db_index=True, verbose_name='Корзина LSH')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.key}'
+
+
+class FeedEntryQuerySet(models.QuerySet):
+
+    def fan_out(self, recipe):
+        followers = Follow.objects.filter(
+            author_id=recipe.author_id
+        ).values_list('user_id', flat=True)
+        self.bulk_create((
+            FeedEntry(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in followers.iterator()
+        ), batch_size=1000, ignore_conflicts=True)
+
+    def backfill(self, user, author_id):
+        recipes = Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date'
+        ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+        self.bulk_create((
+            FeedEntry(user=user, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in recipes
+        ), batch_size=1000, ignore_conflicts=True)
+
+    def backfill_followers(self, author_id):
+        """Рассылает последние рецепты автора всем его подписчикам."""
+        recipes = list(Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date'
+        ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        self.bulk_create((
+            FeedEntry(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+            for user_id in followers.iterator() for pk, pub_date in recipes
+        ), batch_size=1000, ignore_conflicts=True)
+
+    def prune(self, user, author_id):
+        return self.filter(user=user, recipe__author_id=author_id).delete()
+
+    def timeline(self, user, celebrities=(), recipes=None):
+        """Лента пользователя: пары recipe_id и pub_date по убыванию даты.
+
+        Записи берутся из FeedEntry по индексу feed_user_pub_date, а
+        рецепты авторов из celebrities, которым запись не рассылается,
+        добавляются через UNION ALL. Записи, разосланные такому автору
+        до того, как он набрал FEED_FANOUT_LIMIT подписчиков, из первой
+        части исключаются, чтобы рецепт не попал в ленту дважды.
+        recipes ограничивает ленту рецептами из этого QuerySet.
+        """
+        entries = self.filter(user=user)
+        celebrity_recipes = Recipe.objects.none()
+        if celebrities:
+            authors = Follow.objects.filter(
+                user=user, author__in=celebrities
+            ).values('author')
+            entries = entries.exclude(recipe__author__in=authors)
+            celebrity_recipes = Recipe.objects.filter(author__in=authors)
+        if recipes is not None:
+            entries = entries.filter(recipe__in=recipes)
+            celebrity_recipes = celebrity_recipes.filter(pk__in=recipes)
+        parts = [entries.values('recipe_id', 'pub_date')]
+        if celebrities:
+            parts.append(celebrity_recipes.values('pk', 'pub_date'))
+        return FeedTimeline(parts)
+
+
+class FeedTimeline:
+    """Объединение частей ленты для пагинаторов DRF.
+
+    Пагинаторам нужны только order_by, filter, count и срезы. Фильтр
+    курсора применяется к каждой части до объединения, поэтому и
+    страницы глубже первой читаются по индексам.
+    """
+
+    def __init__(self, parts, ordering=('-pub_date', '-recipe_id')):
+        self.parts = parts
+        self.ordering = ordering
+
+    def filter(self, **kwargs):
+        return FeedTimeline(
+            [part.filter(**kwargs) for part in self.parts], self.ordering
+        )
+
+    def order_by(self, *ordering):
+        return FeedTimeline(self.parts, ordering)
+
+    def combined(self):
+        first, *rest = (part.order_by() for part in self.parts)
+        if rest:
+            first = first.union(*rest, all=True)
+        return first.order_by(*self.ordering)
+
+    def count(self):
+        return self.combined().count()
+
+    def __getitem__(self, window):
+        return self.combined()[window]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата создания рецепта')
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date', )
+        constraints = [
+            models.UniqueConstraint(
+                name='feed_user_unique_recipe',
+                fields=['user', 'recipe']
+            )
+        ]
+        indexes = [
+            models.Index(
+                name='feed_user_pub_date', fields=['user', '-pub_date']
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name} в ленте {self.user.username}'
+
+
 class RecipeComponentQuerySet(models.QuerySet):
 
     def shop_list(self, user):
@@ -226,3 +550,127 @@ class RecipeComponent(models.Model):
 
     def __str__(self):
         return self.ingredient.name
+
+
+class ShoppingListIngredientQuerySet(models.QuerySet):
+
+    def apply_deltas(self, author_ids, deltas):
+        """Прибавляет deltas к итогам пользователей author_ids.
+
+        Недостающие строки вставляются с нулём и ignore_conflicts, а
+        количества меняются выражениями F(), поэтому одновременное первое
+        добавление одного ингредиента не падает на уникальном ограничении
+        и не теряет ни одно из слагаемых.
+        """
+        deltas = {pk: amount for pk, amount in deltas.items() if amount}
+        if not author_ids or not deltas:
+            return
+        author_ids = sorted(set(author_ids))
+        with transaction.atomic():
+            self.bulk_create([
+                self.model(
+                    author_id=author_id, ingredient_id=ingredient_id, amount=0
+                )
+                for author_id in author_ids
+                for ingredient_id in sorted(deltas)
+                if deltas[ingredient_id] > 0
+            ], ignore_conflicts=True)
+            rows = self.filter(
+                author_id__in=author_ids, ingredient_id__in=deltas
+            )
+            list(rows.select_for_update().order_by('pk').values_list('pk'))
+            by_amount = defaultdict(list)
+            for ingredient_id, amount in deltas.items():
+                by_amount[amount].append(ingredient_id)
+            for amount, ingredient_ids in by_amount.items():
+                rows.filter(ingredient_id__in=ingredient_ids).update(
+                    amount=Greatest(F('amount') + amount, 0)
+                )
+            rows.filter(amount=0).delete()
+            drop_shopping_list_versions(author_ids)
+
+    def add_recipe(self, user, recipe):
+        Recipe.objects.lock(recipe.pk)
+        self.apply_deltas([user.id], recipe.component_amounts())
+
+    def remove_recipe(self, user, recipe):
+        Recipe.objects.lock(recipe.pk)
+        self.apply_deltas([user.id], {
+            pk: -amount for pk, amount in recipe.component_amounts().items()
+        })
+
+    def update_recipe(self, recipe, deltas):
+        """Применяет изменение состава ко всем корзинам с рецептом.
+
+        Вызывающий должен заранее взять Recipe.objects.lock(recipe.pk)
+        и только после этого прочитать текущий состав.
+        """
+        author_ids = list(ShoppingList.objects.filter(
+            recipes=recipe
+        ).values_list('author_id', flat=True))
+        self.apply_deltas(author_ids, deltas)
+
+    def rebuild(self, author_ids=None):
+        """Пересчитывает итоги заново по корзинам ShoppingList."""
+        current = self.all()
+        totals = RecipeComponent.objects.filter(
+            recipe__shop_list__isnull=False
+        )
+        if author_ids is not None:
+            current = current.filter(author_id__in=author_ids)
+            totals = totals.filter(recipe__shop_list__author__in=author_ids)
+        totals = totals.values(
+            'recipe__shop_list__author', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+        with transaction.atomic():
+            authors = set(current.values_list('author_id', flat=True))
+            current.delete()
+            created = self.bulk_create([
+                self.model(
+                    author_id=item['recipe__shop_list__author'],
+                    ingredient_id=item['ingredient'], amount=item['total']
+                ) for item in totals
+            ], batch_size=1000)
+            authors.update(item.author_id for item in created)
+            drop_shopping_list_versions(authors)
+        return len(created)
+
+    def shop_list(self, user):
+        return self.filter(author=user).order_by('ingredient').values(
+            'ingredient', sum=F('amount'), name=F('ingredient__name'),
+            unit=F('ingredient__measurement_unit')
+        )
+
+
+class ShoppingListIngredient(models.Model):
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_totals',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    objects = ShoppingListIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            models.UniqueConstraint(
+                name='shopping_author_unique_ingredient',
+                fields=['author', 'ingredient']
+            )
+        ]
+        ordering = ('ingredient', )
+
+    def __str__(self):
+        return f'{self.ingredient.name} в списке у {self.author.username}'
@@ -1,4 +1,6 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
 
 
 class PageNumberPaginatorModified(PageNumberPagination):
@@ -8,3 +10,90 @@ class PageNumberPaginatorModified(PageNumberPagination):
 class PageLimitSetPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = '-pk'
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    ordering = 'pk'
+
+
+class TrendingCursorPagination(RecipeCursorPagination):
+    ordering = 'trending_rank'
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    ordering = '-pub_date'
+
+
+class PageOrCursorPagination(BasePagination):
+    """Номера страниц по умолчанию, keyset-курсор при наличии ?cursor=.
+
+    В режиме курсора нет COUNT(*) и OFFSET: следующая страница выбирается
+    по последнему pk, поэтому глубокая прокрутка стоит как первая страница.
+    Параметры из cursor_conflicts задают свой порядок выдачи, который
+    курсор заменил бы своим, поэтому вместе с ?cursor= они запрещены.
+    """
+    page_pagination_class = PageLimitSetPagination
+    cursor_pagination_class = RecipeCursorPagination
+    cursor_conflicts = ()
+
+    def __init__(self):
+        self.paginator = self.page_pagination_class()
+
+    def __getattr__(self, name):
+        if name == 'paginator':
+            raise AttributeError(name)
+        return getattr(self.paginator, name)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_class = self.cursor_pagination_class
+        if cursor_class.cursor_query_param in request.query_params:
+            conflicts = [
+                name for name in self.cursor_conflicts
+                if name in request.query_params
+            ]
+            if conflicts:
+                raise ValidationError({
+                    cursor_class.cursor_query_param:
+                        'Курсор нельзя сочетать с параметрами '
+                        f'{", ".join(conflicts)}, используйте page'
+                })
+            self.paginator = cursor_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_fields(self, view):
+        return self.page_pagination_class().get_schema_fields(view) + (
+            self.cursor_pagination_class().get_schema_fields(view)[:1]
+        )
+
+
+class RecipePagination(PageOrCursorPagination):
+    page_pagination_class = PageLimitSetPagination
+    cursor_pagination_class = RecipeCursorPagination
+    cursor_conflicts = ('search', )
+
+
+class SubscriptionPagination(PageOrCursorPagination):
+    page_pagination_class = PageNumberPaginatorModified
+    cursor_pagination_class = SubscriptionCursorPagination
+
+
+class TrendingPagination(PageOrCursorPagination):
+    page_pagination_class = PageLimitSetPagination
+    cursor_pagination_class = TrendingCursorPagination
+
+
+class FeedPagination(PageOrCursorPagination):
+    page_pagination_class = PageLimitSetPagination
+    cursor_pagination_class = FeedCursorPagination
@@ -0,0 +1,143 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+from api.cache import ChangeLogCache
+from api.models import RecipeComponent
+
+PANTRY_VERSION_KEY = 'pantry_version'
+RECIPE_ID_BITS = 32
+MATCHED_BITS = 16
+RECIPE_LIMIT = (1 << RECIPE_ID_BITS) - 1
+MATCHED_LIMIT = (1 << MATCHED_BITS) - 1
+MISSING_SHIFT = MATCHED_BITS + RECIPE_ID_BITS
+MATCH_STEP = (1 << MISSING_SHIFT) + (1 << RECIPE_ID_BITS)
+
+
+def rank_key(recipe_id, size):
+    """Порядок рецепта без совпадений, упакованный в одно целое число.
+
+    Поля от старших битов к младшим: недостающие ингредиенты, инверсия
+    совпавших, инверсия id. Каждое совпадение вычитает MATCH_STEP, а
+    сравнение чисел заметно быстрее сравнения кортежей.
+    """
+    return (
+        size << MISSING_SHIFT | MATCHED_LIMIT << RECIPE_ID_BITS |
+        RECIPE_LIMIT - recipe_id
+    )
+
+
+class PantryIndex:
+    """Списки id рецептов (posting lists) по ингредиентам.
+
+    Списки хранятся отсортированными массивами array('I'), поэтому индекс
+    на сотни тысяч рецептов занимает единицы мегабайт, а изменение одного
+    рецепта сводится к нескольким вставкам и удалениям.
+    """
+
+    def __init__(self, components):
+        postings = {}
+        recipes = {}
+        for recipe_id, ingredient_id in components:
+            postings.setdefault(ingredient_id, []).append(recipe_id)
+            recipes.setdefault(recipe_id, []).append(ingredient_id)
+        self.postings = {
+            pk: array('I', sorted(ids)) for pk, ids in postings.items()
+        }
+        self.recipes = {pk: tuple(ids) for pk, ids in recipes.items()}
+        self.keys = {
+            pk: rank_key(pk, len(ids)) for pk, ids in self.recipes.items()
+        }
+        self.lock = threading.Lock()
+
+    def replace(self, recipe_ids, components):
+        """Заменяет состав рецептов recipe_ids на пары components."""
+        recipes = dict.fromkeys(recipe_ids, ())
+        for recipe_id, ingredient_id in components:
+            recipes[recipe_id] += (ingredient_id, )
+        with self.lock:
+            for recipe_id, ingredient_ids in recipes.items():
+                for pk in self.recipes.pop(recipe_id, ()):
+                    posting = self.postings[pk]
+                    del posting[bisect_left(posting, recipe_id)]
+                self.keys.pop(recipe_id, None)
+                for pk in ingredient_ids:
+                    insort(self.postings.setdefault(pk, array('I')), recipe_id)
+                if ingredient_ids:
+                    self.recipes[recipe_id] = ingredient_ids
+                    self.keys[recipe_id] = rank_key(
+                        recipe_id, len(ingredient_ids)
+                    )
+
+    def match(self, ingredient_ids, max_missing=None):
+        """Рецепты хотя бы с одним ингредиентом из ingredient_ids.
+
+        Возвращает PantryMatches, упорядоченные по числу недостающих
+        ингредиентов, затем по числу совпавших и по новизне.
+        """
+        with self.lock:
+            matched = Counter()
+            for pk in set(ingredient_ids):
+                matched.update(self.postings.get(pk, ()))
+            keys = self.keys
+            ranked = [
+                keys[recipe_id] - count * MATCH_STEP
+                for recipe_id, count in matched.items()
+            ]
+        if max_missing is not None:
+            bound = (max_missing + 1) << MISSING_SHIFT
+            ranked = [key for key in ranked if key < bound]
+        return PantryMatches(ranked)
+
+
+class PantryMatches:
+    """Ленивая сортировка совпадений для Paginator.
+
+    Срез [start:stop] выбирает stop лучших через heapq, не сортируя
+    весь список кандидатов. Кандидаты идут примерно по возрастанию id,
+    то есть по убыванию ключа, поэтому heapq получает их в обратном
+    порядке и почти сразу отбрасывает неподходящие.
+    """
+
+    def __init__(self, ranked):
+        self.ranked = ranked
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def __getitem__(self, window):
+        if not isinstance(window, slice):
+            return self[window:window + 1][0]
+        stop = len(self.ranked) if window.stop is None else window.stop
+        return [
+            self.unpack(key)
+            for key in heapq.nsmallest(
+                stop, reversed(self.ranked)
+            )[window.start:stop]
+        ]
+
+    @staticmethod
+    def unpack(key):
+        return {
+            'id': RECIPE_LIMIT - (key & RECIPE_LIMIT),
+            'matched_count': MATCHED_LIMIT - (
+                key >> RECIPE_ID_BITS & MATCHED_LIMIT
+            ),
+            'missing_count': key >> MISSING_SHIFT
+        }
+
+
+pantry_index = ChangeLogCache(PANTRY_VERSION_KEY, lambda: PantryIndex(
+    RecipeComponent.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator()
+), lambda recipe_ids: RecipeComponent.objects.filter(
+    recipe_id__in=recipe_ids
+).values_list('recipe_id', 'ingredient_id'))
+
+
+def record_recipe_changes(recipe_ids):
+    """Записывает изменение состава рецептов после фиксации транзакции."""
+    pantry_index.record(recipe_ids)
@@ -0,0 +1,271 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef,
+                              Subquery, Value, When)
+
+from api.cache import (INGREDIENTS_VERSION_KEY, RECIPE_SEARCH_VERSION_KEY,
+                       RECIPE_TAGS_VERSION_KEY, ChangeLogCache,
+                       ReferenceCache, ingredients)
+from api.models import Recipe, RecipeComponent
+
+SET_BIT = re.compile('1')
+TAG_FILTER_MAX_IDS = 5000
+WORD = re.compile(r'\w+')
+SEARCH_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+SEARCH_RESULTS_LIMIT = 1000
+
+
+class PrefixTrie:
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key, value):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(value)
+
+    def search(self, prefix, limit=None):
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        stack = [node]
+        while stack and (limit is None or len(found) < limit):
+            node = stack.pop()
+            found.extend(node.get(None, ()))
+            stack.extend(
+                node[char] for char in sorted(
+                    (char for char in node if char is not None), reverse=True
+                )
+            )
+        return found[:limit]
+
+
+class IngredientIndex:
+
+    def __init__(self, catalog):
+        self.names = sorted(
+            (item['name'].casefold(), pk) for pk, item in catalog.items()
+        )
+        self.trie = PrefixTrie()
+        for name, pk in self.names:
+            self.trie.insert(name, pk)
+
+    def search(self, query, limit=None):
+        query = query.casefold()
+        found = self.trie.search(query, limit)
+        if limit is None or len(found) < limit:
+            prefixed = set(found)
+            found.extend(
+                pk for name, pk in self.names
+                if query in name and pk not in prefixed
+            )
+        return found[:limit]
+
+
+ingredient_index = ReferenceCache(
+    INGREDIENTS_VERSION_KEY, lambda: IngredientIndex(ingredients.get())
+)
+
+
+class TagIndex:
+    """Битовые карты id рецептов по slug тэга.
+
+    Бит N карты установлен, если рецепт с pk=N отмечен тэгом; несколько
+    тэгов объединяются побитовыми | (any) и & (all).
+    """
+
+    def __init__(self, pairs):
+        recipes = {}
+        for slug, recipe_id in pairs:
+            recipes.setdefault(slug, []).append(recipe_id)
+        self.bitmaps = {}
+        for slug, ids in recipes.items():
+            data = bytearray(max(ids) // 8 + 1)
+            for pk in ids:
+                data[pk >> 3] |= 1 << (pk & 7)
+            self.bitmaps[slug] = int.from_bytes(data, 'little')
+
+    def match(self, slugs, match_all=False):
+        bitmaps = [self.bitmaps.get(slug, 0) for slug in slugs]
+        return reduce(and_ if match_all else or_, bitmaps, bitmaps[0])
+
+    def replace(self, recipe_ids, pairs):
+        """Заменяет тэги рецептов recipe_ids на пары (slug, recipe_id)."""
+        mask = 0
+        for pk in recipe_ids:
+            mask |= 1 << pk
+        bitmaps = {
+            slug: bitmap & ~mask for slug, bitmap in self.bitmaps.items()
+        }
+        for slug, pk in pairs:
+            bitmaps[slug] = bitmaps.get(slug, 0) | 1 << pk
+        self.bitmaps = bitmaps
+
+    @staticmethod
+    def count(bitmap):
+        return bin(bitmap).count('1')
+
+    @staticmethod
+    def ids(bitmap):
+        bits = format(bitmap, 'b')
+        top = len(bits) - 1
+        return [top - found.start() for found in SET_BIT.finditer(bits)]
+
+
+tag_index = ChangeLogCache(RECIPE_TAGS_VERSION_KEY, lambda: TagIndex(
+    Recipe.tags.through.objects.values_list(
+        'tag__slug', 'recipe_id'
+    ).iterator()
+), lambda recipe_ids: Recipe.tags.through.objects.filter(
+    recipe_id__in=recipe_ids
+).values_list('tag__slug', 'recipe_id'))
+
+
+def list_index_versions(params):
+    """Версии индексов, которые прочтёт фильтр списка рецептов."""
+    versions = []
+    if params.getlist('tags'):
+        tag_index.get()
+        versions.append(tag_index.version)
+    if params.get('search') and connection.vendor != 'postgresql':
+        recipe_search_index.get()
+        versions.append(recipe_search_index.version)
+    return versions
+
+
+def filter_by_tags(queryset, slugs, match_all=False):
+    bitmap = tag_index.get().match(slugs, match_all)
+    if TagIndex.count(bitmap) <= TAG_FILTER_MAX_IDS:
+        return queryset.filter(pk__in=TagIndex.ids(bitmap))
+    tagged = Recipe.tags.through.objects.filter(recipe=OuterRef('pk'))
+    if match_all:
+        return queryset.filter(*(
+            Exists(tagged.filter(tag__slug=slug)) for slug in slugs
+        ))
+    return queryset.filter(Exists(tagged.filter(tag__slug__in=slugs)))
+
+
+def search_words(text):
+    return WORD.findall((text or '').casefold())
+
+
+class RecipeSearchIndex:
+    """Инвертированный индекс рецептов для СУБД без полнотекстового поиска.
+
+    Веса полей те же, что у setweight в PostgreSQL: название (A) выше
+    ингредиентов (B), ингредиенты выше текста (C). Слова сравниваются
+    целиком, без стемминга.
+    """
+
+    def __init__(self, recipes, components):
+        self.postings = {}
+        for pk, name, text in recipes:
+            self.add(pk, name, 'A')
+            self.add(pk, text, 'C')
+        for pk, name in components:
+            self.add(pk, name, 'B')
+
+    def add(self, pk, text, weight):
+        for word in search_words(text):
+            scores = self.postings.setdefault(word, {})
+            scores[pk] = scores.get(pk, 0) + SEARCH_WEIGHTS[weight]
+
+    def search(self, query, limit=None):
+        postings = sorted(
+            (self.postings.get(word, {}) for word in set(search_words(query))),
+            key=len
+        )
+        if not postings:
+            return []
+        found = dict(postings[0])
+        for scores in postings[1:]:
+            found = {
+                pk: score + scores[pk]
+                for pk, score in found.items() if pk in scores
+            }
+        return sorted(found, key=lambda pk: (-found[pk], -pk))[:limit]
+
+
+recipe_search_index = ReferenceCache(
+    RECIPE_SEARCH_VERSION_KEY, lambda: RecipeSearchIndex(
+        Recipe.objects.values_list('pk', 'name', 'text').iterator(),
+        RecipeComponent.objects.values_list(
+            'recipe_id', 'ingredient__name'
+        ).iterator()
+    )
+)
+
+
+def recipe_search_vector():
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import SearchVector
+
+    config = settings.SEARCH_CONFIG
+    names = RecipeComponent.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=config) +
+        SearchVector(Subquery(names), weight='B', config=config) +
+        SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipe_ids):
+    if connection.vendor != 'postgresql':
+        transaction.on_commit(recipe_search_index.invalidate)
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=recipe_search_vector()
+    )
+
+
+def search_recipes(queryset, query):
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(
+            query, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector__matches=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pk')
+    return in_order(
+        queryset,
+        recipe_search_index.get().search(query, SEARCH_RESULTS_LIMIT)
+    )
+
+
+def search_ingredients(queryset, query, limit=None):
+    if connection.vendor == 'postgresql':
+        return list(queryset.filter(name__icontains=query).annotate(
+            prefix_match=Case(
+                When(name__istartswith=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('prefix_match', 'name').values_list('pk', flat=True)[
+            :limit
+        ])
+    return ingredient_index.get().search(query, limit)
+
+
+def in_order(queryset, pks):
+    if not pks:
+        return queryset.none()
+    return queryset.filter(pk__in=pks).order_by(Case(
+        *(When(pk=pk, then=Value(position))
+          for position, pk in enumerate(pks)),
+        output_field=IntegerField()
+    ))
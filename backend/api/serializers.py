@@ -1,16 +1,29 @@
+from collections import Counter
+
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.cache import bump_recipes_generation, ingredients
+from api.images import make_renditions, release_files, rendition_urls
 from api.models import (FavorRecipe, Ingredient, Recipe, RecipeComponent,
-                        ShoppingList, Tag)
+                        ShoppingList, ShoppingListIngredient, Tag)
+from api.pantry import record_recipe_changes
+from api.search import update_search_vectors
+from api.similarity import refresh_similar_recipes
+from api.tasks import run_in_background
+from foodgram.metrics import SerializerTimingMixin
 from users.serializers import UserSerializer
 
 
 MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 32766
+PANTRY_MAX_INGREDIENTS = 50
+INGREDIENT_SEARCH_LIMIT = 20
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SerializerTimingMixin,
+                           serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
@@ -52,17 +65,9 @@ class IngredientWriteSerializer(serializers.ModelSerializer):
         model = Ingredient
         fields = ('id', 'amount', 'measurement_unit')
 
-    def validate(self, attrs):
-        if not Ingredient.objects.filter(pk=attrs['id']).exists:
-            raise serializers.ValidationError(
-                {
-                    'ingredients': f'ингредиент с id {attrs["id"]} не найден'
-                },
-            )
-        return attrs
-
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SerializerTimingMixin,
+                    serializers.ModelSerializer):
 
     class Meta:
         model = Tag
@@ -70,28 +75,23 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class RecipeComponentSerializer(serializers.ModelSerializer):
-    id = serializers.SlugRelatedField(
-        source='ingredient',
-        slug_field='id',
-        queryset=Ingredient.objects.all()
-    )
-    name = serializers.SlugRelatedField(
-        source='ingredient',
-        slug_field='name',
-        read_only=True
-    )
-    measurement_unit = serializers.SlugRelatedField(
-        source='ingredient',
-        slug_field='measurement_unit',
-        read_only=True
-    )
+    id = serializers.ReadOnlyField(source='ingredient_id')
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeComponent
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
+    def get_name(self, component):
+        return ingredients.lookup(component.ingredient_id)['name']
+
+    def get_measurement_unit(self, component):
+        return ingredients.lookup(component.ingredient_id)['measurement_unit']
+
 
-class RecipeWriteSerializer(serializers.ModelSerializer):
+class RecipeWriteSerializer(SerializerTimingMixin,
+                            serializers.ModelSerializer):
     tags = serializers.SlugRelatedField(
         queryset=Tag.objects.all(),
         many=True,
@@ -108,69 +108,137 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                   'image', 'text', 'cooking_time')
 
     def validate(self, attrs):
-        cooking_time = self.initial_data.get('cooking_time')
+        if not self.partial or 'cooking_time' in self.initial_data:
+            self.validate_cooking_time_value(
+                self.initial_data.get('cooking_time')
+            )
+        if not self.partial or 'ingredients' in self.initial_data:
+            self.validate_ingredients_list(attrs.get('ingredients'))
+        return attrs
+
+    def validate_cooking_time_value(self, cooking_time):
         if (cooking_time is None or
                 int(cooking_time) < MIN_COOKING_TIME or int(cooking_time) > MAX_COOKING_TIME):
             raise serializers.ValidationError(
                 f'Время приготовления не может быть меньше {MIN_COOKING_TIME} '
                 f'и больше {MAX_COOKING_TIME}'
             )
-        ingredients = self.initial_data.get('ingredients')
+
+    def validate_ingredients_list(self, ingredients):
         if not ingredients:
             raise serializers.ValidationError(
                 {'ingredients':
                     'Список ингредиентов не получен'}
             )
-        ingredients = attrs['ingredients']
         for ingredient in ingredients:
             if ingredient['amount'] <= 0:
                 raise serializers.ValidationError(
                     {'ingredients':
                      'Увеличьте количество ингридиентов'}
                 )
-        return attrs
+        ids = [ingredient['id'] for ingredient in ingredients]
+        duplicates = sorted(
+            pk for pk, count in Counter(ids).items() if count > 1
+        )
+        if duplicates:
+            raise serializers.ValidationError(
+                {'ingredients':
+                    'Найдены дублирующиеся ингредиенты id '
+                    f'{", ".join(map(str, duplicates))}'}
+            )
+        missing = sorted(set(ids) - Ingredient.objects.in_bulk(ids).keys())
+        if missing:
+            raise serializers.ValidationError(
+                {'ingredients':
+                    'Не найдены ингредиенты с id '
+                    f'{", ".join(map(str, missing))}'}
+            )
 
-    def create_update_method(self, validated_data, recipe=None):
+    def save_components(self, recipe, ingredients, created=False):
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        if not created:
+            Recipe.objects.lock(recipe.pk)
+        current = {} if created else {
+            component.ingredient_id: component
+            for component in RecipeComponent.objects.filter(recipe=recipe)
+        }
+        deltas = {
+            pk: amounts.get(pk, 0) - (
+                current[pk].amount if pk in current else 0
+            ) for pk in amounts.keys() | current.keys()
+        }
+        added = [
+            RecipeComponent(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items() if pk not in current
+        ]
+        changed = []
+        for pk, component in current.items():
+            if deltas[pk] and pk in amounts:
+                component.amount = amounts[pk]
+                changed.append(component)
+        removed = [
+            component.pk for pk, component in current.items()
+            if pk not in amounts
+        ]
+        RecipeComponent.objects.bulk_create(added)
+        RecipeComponent.objects.bulk_update(changed, ['amount'])
+        if removed:
+            RecipeComponent.objects.filter(pk__in=removed).delete()
+        if not created:
+            ShoppingListIngredient.objects.update_recipe(recipe, deltas)
+
+    def save_tags(self, recipe, tags, created=False):
+        new = {tag.pk for tag in tags}
+        current = set() if created else set(
+            recipe.tags.values_list('pk', flat=True)
+        )
+        if new - current:
+            recipe.tags.add(*(new - current))
+        if current - new:
+            recipe.tags.remove(*(current - new))
+
+    @transaction.atomic
+    def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        if recipe:
-            recipe.component_recipes.all().delete()
-        else:
-            recipe = Recipe.objects.create(**validated_data)
-        ingredient_instances = []
-        seen_ingredients = set()
-        for ingredient in ingredients:
-            id = ingredient['id']
-            if id in seen_ingredients:
-                raise serializers.ValidationError(
-                    f'Найден дублирующийся ингредиент id {id}'
-                )
-            seen_ingredients.add(id)
-            ingr_id = Ingredient.objects.get(pk=id)
-            amt = ingredient['amount']
-            ingredient_instances.append(
-                RecipeComponent(ingredient=ingr_id, recipe=recipe, amount=amt)
-            )
-        for ingredient in ingredients:
-            if int(ingredient['amount']) <= 1:
-                raise serializers.ValidationError(('Убедитесь, что значение количества '
-                                                   'ингредиента больше или равно 1.')
-                                                  )
-        RecipeComponent.objects.bulk_create(ingredient_instances)
-        recipe.tags.set(tags)
+        recipe = Recipe.objects.create(**validated_data)
+        self.save_components(recipe, ingredients, created=True)
+        self.save_tags(recipe, tags, created=True)
+        update_search_vectors([recipe.pk])
+        record_recipe_changes([recipe.pk])
+        run_in_background(refresh_similar_recipes, [recipe.pk])
+        bump_recipes_generation()
+        if recipe.image:
+            run_in_background(make_renditions, recipe.pk)
         return recipe
 
-    def create(self, validated_data):
-        return self.create_update_method(validated_data)
-
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance = self.create_update_method(validated_data, recipe=instance)
-        instance.name = validated_data.pop('name')
-        instance.text = validated_data.pop('text')
-        if validated_data.get('image') is not None:
-            instance.image = validated_data.pop('image')
-        instance.cooking_time = validated_data.pop('cooking_time')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if ingredients is not None:
+            self.save_components(instance, ingredients)
+            record_recipe_changes([instance.pk])
+        if tags is not None:
+            self.save_tags(instance, tags)
+        if ingredients is not None or tags is not None:
+            run_in_background(refresh_similar_recipes, [instance.pk])
+        if validated_data.get('image') is None:
+            validated_data.pop('image', None)
+        else:
+            run_in_background(release_files, [
+                instance.image.name, *instance.images.values()
+            ])
+            run_in_background(make_renditions, instance.pk)
+            instance.images = {}
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
         instance.save()
+        update_search_vectors([instance.pk])
+        bump_recipes_generation()
         return instance
 
     def to_representation(self, instance):
@@ -182,27 +250,39 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         ).data
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SerializerTimingMixin,
+                           serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField('get_ingredients')
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = ('search_vector', )
+
+    def get_images(self, recipe):
+        return rendition_urls(recipe, self.context.get('request'))
 
     def get_ingredients(self, recipe):
-        queryset = RecipeComponent.objects.filter(recipe=recipe)
-        return RecipeComponentSerializer(queryset, many=True).data
+        return RecipeComponentSerializer(
+            recipe.component_recipes.all(), many=True
+        ).data
 
+    def to_representation(self, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        return super().to_representation(recipe)
 
-class ShoppingSerializer(serializers.ModelSerializer):
+
+class ShoppingSerializer(SerializerTimingMixin,
+                         serializers.ModelSerializer):
 
     class Meta:
         model = ShoppingList
-        fields = '__all__'
+        fields = ('id', 'recipes', 'author')
 
     def validate(self, attrs):
         if not Ingredient.objects.filter(pk=attrs['recipes'].id).exists:
@@ -225,7 +305,8 @@ class ShoppingSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class FavorSerializer(serializers.ModelSerializer):
+class FavorSerializer(SerializerTimingMixin,
+                      serializers.ModelSerializer):
     def validate(self, attrs):
         if not Recipe.objects.filter(pk=attrs['recipes'].id).exists:
             raise serializers.ValidationError(
@@ -245,4 +326,17 @@ class FavorSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = FavorRecipe
-        fields = '__all__'
+        fields = ('id', 'recipes', 'author')
+
+
+class IngredientQuerySerializer(serializers.Serializer):
+    name = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+
+class PantryQuerySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1, max_length=PANTRY_MAX_INGREDIENTS
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
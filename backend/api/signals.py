@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from api.cache import (bump_recipes_generation, drop_user_flags, ingredients,
+                       tags)
+from api.images import release_files
+from api.models import (FavorRecipe, Ingredient, Recipe, ShoppingList,
+                        ShoppingListIngredient, Tag)
+from api.pantry import record_recipe_changes
+from api.search import (ingredient_index, recipe_search_index, tag_index,
+                        update_search_vectors)
+from api.tasks import run_in_background
+from users.models import Follow
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_leaves_shopping_lists(sender, instance, **kwargs):
+    Recipe.objects.lock(instance.pk)
+    ShoppingListIngredient.objects.update_recipe(instance, {
+        pk: -amount for pk, amount in instance.component_amounts().items()
+    })
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    bump_recipes_generation()
+    tag_index.record([instance.pk])
+    recipe_search_index.invalidate()
+    record_recipe_changes([instance.pk])
+    if instance.image:
+        run_in_background(release_files, [
+            instance.image.name, *instance.images.values()
+        ])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    ingredients.invalidate()
+    transaction.on_commit(ingredient_index.reset)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        run_in_background(update_search_vectors, list(
+            instance.recipe_ingredient.values_list('recipe', flat=True)
+        ))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    tags.invalidate()
+    tag_index.invalidate()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        tag_index.record([instance.pk])
+    elif pk_set is None:
+        tag_index.invalidate()
+    else:
+        tag_index.record(pk_set)
+
+
+@receiver(post_save, sender=FavorRecipe)
+@receiver(post_delete, sender=FavorRecipe)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def user_recipe_flags_changed(sender, instance, **kwargs):
+    drop_user_flags(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def user_follows_changed(sender, instance, **kwargs):
+    drop_user_flags(instance.user_id)
@@ -0,0 +1,176 @@
+import heapq
+import random
+import struct
+from collections import Counter, defaultdict
+from functools import lru_cache
+from hashlib import blake2b
+
+from django.db import transaction
+
+from api.models import (Recipe, RecipeComponent, SimilarityBucket,
+                        SimilarRecipe)
+
+SIMILAR_COUNT = 10
+CANDIDATE_LIMIT = 200
+SIGNATURE_SIZE = 96
+BANDS = 32
+ROWS = SIGNATURE_SIZE // BANDS
+HASH_PRIME = (1 << 61) - 1
+_permutations = random.Random(SIGNATURE_SIZE)
+PERMUTATIONS = tuple(
+    (_permutations.randrange(1, HASH_PRIME),
+     _permutations.randrange(HASH_PRIME))
+    for _ in range(SIGNATURE_SIZE)
+)
+
+
+def load_features(recipe_ids=None):
+    """Множества признаков рецептов: ингредиенты (2n) и тэги (2n + 1)."""
+    components = RecipeComponent.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    )
+    tags = Recipe.tags.through.objects.values_list('recipe_id', 'tag_id')
+    if recipe_ids is not None:
+        components = components.filter(recipe_id__in=recipe_ids)
+        tags = tags.filter(recipe_id__in=recipe_ids)
+    features = defaultdict(set)
+    for recipe_id, pk in components.iterator():
+        features[recipe_id].add(2 * pk)
+    for recipe_id, pk in tags.iterator():
+        features[recipe_id].add(2 * pk + 1)
+    return features
+
+
+@lru_cache(maxsize=65536)
+def feature_hashes(feature):
+    return tuple((a * feature + b) % HASH_PRIME for a, b in PERMUTATIONS)
+
+
+def signature(features):
+    """MinHash-сигнатура: минимум каждой из SIGNATURE_SIZE хэш-функций."""
+    return tuple(map(min, zip(*map(feature_hashes, features))))
+
+
+def band_keys(features):
+    """Ключи LSH-корзин: по одному на каждую полосу из ROWS значений.
+
+    Рецепты с коэффициентом Жаккара s попадают в общую корзину
+    с вероятностью 1 - (1 - s ** ROWS) ** BANDS, то есть почти
+    наверняка при s > 0.5 и редко при s < 0.1.
+    """
+    values = signature(features)
+    return [
+        int.from_bytes(blake2b(struct.pack(
+            f'>{ROWS + 1}Q', band, *values[band * ROWS:(band + 1) * ROWS]
+        ), digest_size=8).digest(), 'big', signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def jaccard(first, second):
+    common = len(first & second)
+    return common / (len(first) + len(second) - common)
+
+
+def best_candidates(recipe_id, keys, buckets):
+    """Кандидаты с наибольшим числом общих корзин.
+
+    Число общих полос растёт со сходством, поэтому при переполненных
+    корзинах точный коэффициент считается лишь для CANDIDATE_LIMIT
+    самых вероятных соседей.
+    """
+    shared = Counter(pk for key in keys for pk in buckets[key])
+    shared.pop(recipe_id, None)
+    return [pk for pk, _ in shared.most_common(CANDIDATE_LIMIT)]
+
+
+def similar_rows(recipe_id, scores, count=SIMILAR_COUNT):
+    best = heapq.nlargest(
+        count, ((score, pk) for pk, score in scores.items() if score > 0)
+    )
+    return [
+        SimilarRecipe(
+            recipe_id=recipe_id, similar_id=pk, score=score, rank=rank
+        ) for rank, (score, pk) in enumerate(best, 1)
+    ]
+
+
+def build_similar_recipes(count=SIMILAR_COUNT):
+    """Пересчитывает корзины LSH и списки похожих для всех рецептов.
+
+    Точный коэффициент Жаккара считается только для пар, попавших
+    в общую корзину, а не для всех N² пар.
+    """
+    features = load_features()
+    keys = {}
+    buckets = defaultdict(list)
+    for recipe_id, recipe_features in features.items():
+        keys[recipe_id] = band_keys(recipe_features)
+        for key in keys[recipe_id]:
+            buckets[key].append(recipe_id)
+    rows = []
+    for recipe_id, recipe_features in features.items():
+        rows.extend(similar_rows(recipe_id, {
+            pk: jaccard(recipe_features, features[pk])
+            for pk in best_candidates(recipe_id, keys[recipe_id], buckets)
+        }, count))
+    with transaction.atomic():
+        SimilarityBucket.objects.all().delete()
+        SimilarityBucket.objects.bulk_create((
+            SimilarityBucket(recipe_id=recipe_id, key=key)
+            for recipe_id, recipe_keys in keys.items()
+            for key in recipe_keys
+        ), batch_size=5000)
+        SimilarRecipe.objects.all().delete()
+        SimilarRecipe.objects.bulk_create(rows, batch_size=5000)
+    return len(features), len(rows)
+
+
+def refresh_similar_recipes(recipe_ids):
+    for recipe_id in recipe_ids:
+        refresh_recipe(recipe_id)
+
+
+@transaction.atomic
+def refresh_recipe(recipe_id, count=SIMILAR_COUNT):
+    """Обновляет корзины рецепта, его список похожих и списки соседей.
+
+    Соседи — рецепты из общих корзин и ранее ссылавшиеся на рецепт: в их
+    списках меняется только оценка этого рецепта, поэтому освободившееся
+    место не занимает следующий кандидат до очередного пересчёта
+    командой build_similar_recipes.
+    """
+    features = load_features([recipe_id]).get(recipe_id)
+    SimilarityBucket.objects.filter(recipe_id=recipe_id).delete()
+    neighbours = set(SimilarRecipe.objects.filter(
+        similar_id=recipe_id
+    ).values_list('recipe_id', flat=True))
+    scores = {}
+    if features:
+        keys = band_keys(features)
+        SimilarityBucket.objects.bulk_create(
+            SimilarityBucket(recipe_id=recipe_id, key=key) for key in keys
+        )
+        buckets = defaultdict(list)
+        for pk, key in SimilarityBucket.objects.filter(
+            key__in=keys
+        ).values_list('recipe_id', 'key'):
+            buckets[key].append(pk)
+        neighbours.update(best_candidates(recipe_id, keys, buckets))
+        scores = {
+            pk: jaccard(features, other)
+            for pk, other in load_features(neighbours).items()
+        }
+    lists = defaultdict(dict)
+    for pk, similar_id, score in SimilarRecipe.objects.filter(
+        recipe_id__in=neighbours
+    ).values_list('recipe_id', 'similar_id', 'score'):
+        lists[pk][similar_id] = score
+    rows = similar_rows(recipe_id, scores, count)
+    for pk in neighbours:
+        lists[pk][recipe_id] = scores.get(pk, 0)
+        rows.extend(similar_rows(pk, lists[pk], count))
+    SimilarRecipe.objects.filter(
+        recipe_id__in=neighbours | {recipe_id}
+    ).delete()
+    SimilarRecipe.objects.bulk_create(rows)
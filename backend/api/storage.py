@@ -0,0 +1,64 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+REUSE_GRACE = 60 * 10
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """Файлы хранятся под SHA-256 содержимого: <каталог>/ab/abcd….ext.
+
+    Одинаковые загрузки попадают в один файл, а содержимое по имени
+    никогда не меняется, поэтому такие URL можно кэшировать навсегда.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        hexdigest = digest.hexdigest()
+        name = os.path.join(
+            directory, hexdigest[:2], f'{hexdigest}{extension}'
+        ).replace('\\', '/')
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return self._save(name, content)
+
+    def _save(self, name, content):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, 'wb') as target:
+            for chunk in content.chunks():
+                target.write(chunk)
+        os.chmod(temporary, self.file_permissions_mode or 0o644)
+        os.replace(temporary, path)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def is_recent(self, name):
+        try:
+            return time.time() - os.path.getmtime(self.path(name)) < (
+                REUSE_GRACE
+            )
+        except FileNotFoundError:
+            return False
+
+
+recipe_images = ContentHashStorage()
@@ -0,0 +1,30 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_WORKERS,
+    thread_name_prefix='foodgram-task'
+)
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась ошибкой', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def run_in_background(func, *args):
+    """Выполняет func(*args) в пуле потоков после фиксации транзакции.
+
+    Задачи живут только в памяти процесса: потерянные при перезапуске
+    восстанавливаются соответствующими management-командами.
+    """
+    transaction.on_commit(lambda: executor.submit(_run, func, args))
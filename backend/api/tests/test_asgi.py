@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+from rest_framework.authtoken.models import Token
+
+from api.views import ShoppingCartDL
+from foodgram.async_views import StreamingASGIHandler
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+LINES = 5
+LINE_DELAY = 0.05
+
+
+def slow_txt(items):
+    list(items)
+    for number in range(LINES):
+        time.sleep(LINE_DELAY)
+        yield f'строка {number}\n'.encode()
+
+
+async def download(token):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': DOWNLOAD_URL,
+        'raw_path': DOWNLOAD_URL.encode(), 'query_string': b'format=txt',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'authorization', f'Token {token}'.encode()),
+        ],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    messages = []
+    ticks = []
+    streaming = True
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    async def ticker():
+        while streaming:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    ticking = asyncio.ensure_future(ticker())
+    await StreamingASGIHandler()(scope, receive, send)
+    streaming = False
+    await ticking
+    return messages, ticks
+
+
+@pytest.mark.django_db(transaction=True)
+def test_download_streams_without_blocking_the_loop(
+    settings, monkeypatch, user
+):
+    settings.ROOT_URLCONF = 'foodgram.asgi_urls'
+    monkeypatch.setitem(ShoppingCartDL.exporters, 'txt', slow_txt)
+    token = Token.objects.create(user=user).key
+
+    messages, ticks = asyncio.run(download(token))
+
+    start, *bodies = messages
+    assert start['status'] == 200
+    assert b'ETag' in dict(start['headers'])
+    assert b''.join(body.get('body', b'') for body in bodies) == ''.join(
+        f'строка {number}\n' for number in range(LINES)
+    ).encode()
+    assert len(bodies) > LINES
+    assert max(
+        later - earlier for earlier, later in zip(ticks, ticks[1:])
+    ) < LINE_DELAY * LINES / 2
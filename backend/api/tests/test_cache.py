@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from api import cache as list_cache
+from api.models import Ingredient, Tag
+
+KEY = 'test_value'
+RECIPES_URL = '/api/recipes/'
+INGREDIENTS_URL = '/api/ingredients/'
+TAGS_URL = '/api/tags/'
+
+
+class FailingAddCache(LocMemCache):
+    """Кэш, у которого add() не срабатывает, как у недоступного Redis."""
+
+    def add(self, *args, **kwargs):
+        return False
+
+
+def test_unavailable_lock_computes_without_waiting(settings):
+    settings.CACHES = {'default': {
+        'BACKEND': 'api.tests.test_cache.FailingAddCache',
+        'LOCATION': 'foodgram-failing-add',
+    }}
+    started = time.monotonic()
+    assert list_cache.get_or_compute(KEY, lambda: 'fresh', 60) == 'fresh'
+    assert time.monotonic() - started < list_cache.STAMPEDE_WAIT_TIMEOUT / 2
+
+
+def test_held_lock_waits_for_holder(isolated_cache):
+    isolated_cache.add(f'{KEY}:lock', 1)
+
+    def finish():
+        time.sleep(0.2)
+        isolated_cache.set(KEY, ('holder', 0, time.time() + 60))
+        isolated_cache.delete(f'{KEY}:lock')
+
+    holder = threading.Thread(target=finish)
+    holder.start()
+    assert list_cache.get_or_compute(KEY, lambda: 'waiter', 60) == 'holder'
+    holder.join()
+
+
+def test_released_lock_stops_waiting(isolated_cache):
+    started = time.monotonic()
+    isolated_cache.add(f'{KEY}:lock', 1)
+    threading.Timer(0.1, isolated_cache.delete, [f'{KEY}:lock']).start()
+    assert list_cache.get_or_compute(KEY, lambda: 'waiter', 60) == 'waiter'
+    assert time.monotonic() - started < list_cache.STAMPEDE_WAIT_TIMEOUT / 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_recipe_list_is_fresh_after_writes(
+    user_client, other_client, create_recipe
+):
+    first = create_recipe(other_client)['id']
+    assert [
+        recipe['id'] for recipe in user_client.get(RECIPES_URL).json()[
+            'results'
+        ]
+    ] == [first]
+
+    second = create_recipe(other_client)['id']
+    user_client.get(f'{RECIPES_URL}{first}/favorite/')
+    user_client.get(f'{RECIPES_URL}{second}/shopping_cart/')
+    results = user_client.get(RECIPES_URL).json()['results']
+    assert [
+        (recipe['id'], recipe['is_favorited'], recipe['is_in_shopping_cart'])
+        for recipe in results
+    ] == [(second, False, True), (first, True, False)]
+
+    other_client.delete(f'{RECIPES_URL}{second}/')
+    user_client.delete(f'{RECIPES_URL}{first}/favorite/')
+    results = user_client.get(RECIPES_URL).json()['results']
+    assert [
+        (recipe['id'], recipe['is_favorited']) for recipe in results
+    ] == [(first, False)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reference_lists_are_fresh_after_writes(anon_client, catalog):
+    assert len(anon_client.get(INGREDIENTS_URL).json()) == 10
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    assert anon_client.get(
+        INGREDIENTS_URL, {'name': 'сол'}
+    ).json()[0]['name'] == 'соль'
+
+    assert len(anon_client.get(TAGS_URL).json()) == 2
+    tag = Tag.objects.get(slug='lunch')
+    tag.name = 'Ужин'
+    tag.save()
+    assert {
+        tag['name'] for tag in anon_client.get(TAGS_URL).json()
+    } == {'Завтрак', 'Ужин'}
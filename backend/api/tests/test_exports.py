@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+from fontTools.ttLib import TTFont
+from pypdf import PdfReader
+
+from api.exports import (CSV_HEADER, FOOTER, LINES_PER_PAGE, render_csv,
+                         render_pdf, render_txt)
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+TITLE = 'Список покупок'
+ITEMS = [
+    {'name': 'Мука', 'sum': 500, 'unit': 'г'},
+    {'name': 'Яйца', 'sum': 3, 'unit': 'шт'},
+]
+
+
+def pdf_font(reader):
+    font = reader.pages[0]['/Resources']['/Font']['/F1'].get_object()
+    descriptor = font['/DescendantFonts'][0].get_object()['/FontDescriptor']
+    return TTFont(io.BytesIO(
+        descriptor.get_object()['/FontFile2'].get_object().get_data()
+    ))
+
+
+def test_txt_and_csv():
+    assert ''.join(render_txt(iter(ITEMS))) == (
+        f'Мука - 500 г \r\nЯйца - 3 шт \r\n\r\n{FOOTER}'
+    )
+    assert ''.join(render_csv(iter(ITEMS))).splitlines() == [
+        ','.join(CSV_HEADER), 'Мука,500,г', 'Яйца,3,шт'
+    ]
+
+
+def test_pdf_pages_and_subset_font(settings):
+    if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        pytest.skip('нет шрифта SHOPPING_LIST_PDF_FONT')
+    items = ITEMS * LINES_PER_PAGE
+    reader = PdfReader(io.BytesIO(b''.join(render_pdf(iter(items)))))
+
+    assert len(reader.pages) == 3
+    text = ''.join(page.extract_text() for page in reader.pages)
+    assert TITLE in text and 'Яйца - 3 шт' in text and FOOTER in text
+
+    source = TTFont(settings.SHOPPING_LIST_PDF_FONT)
+    subset = pdf_font(reader)
+
+    def contours(char):
+        glyph = source.getGlyphID(source.getBestCmap()[ord(char)])
+        return subset['glyf'][subset.getGlyphName(glyph)].numberOfContours
+
+    for char in 'СписокпуМЯйцашт':
+        assert contours(char), char
+    for char in 'ЖЩЭ':
+        assert not contours(char), char
+
+
+@pytest.mark.django_db(transaction=True)
+def test_download_etag(user_client, other_client, create_recipe):
+    first = create_recipe(other_client)['id']
+    second = create_recipe(other_client)['id']
+    user_client.get(f'/api/recipes/{first}/shopping_cart/')
+
+    response = user_client.get(DOWNLOAD_URL, {'format': 'csv'})
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content).decode().startswith(
+        ','.join(CSV_HEADER)
+    )
+    etag = response['ETag']
+    assert user_client.get(
+        DOWNLOAD_URL, {'format': 'csv'}, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    assert user_client.get(
+        DOWNLOAD_URL, {'format': 'txt'}, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+    user_client.get(f'/api/recipes/{second}/shopping_cart/')
+    response = user_client.get(
+        DOWNLOAD_URL, {'format': 'csv'}, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == 200
+    assert response['ETag'] != etag
@@ -0,0 +1,69 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from api.cache import FEED_CELEBRITIES_KEY
+from api.models import FeedEntry
+
+FEED_URL = '/api/recipes/feed/'
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username='chef', email='chef@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+def subscribe(client, author):
+    response = client.get(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == 201, response.content
+
+
+def feed(client, query=''):
+    response = client.get(f'{FEED_URL}?limit=50{query}')
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_feed_fans_out_and_applies_filters(
+    user, user_client, author, author_client, create_recipe
+):
+    old = create_recipe(author_client, tags=['breakfast'])['id']
+    subscribe(user_client, author)
+    new = create_recipe(author_client, tags=['lunch'])['id']
+
+    assert FeedEntry.objects.filter(user=user).count() == 2
+    assert feed(user_client) == [new, old]
+    assert feed(user_client, '&tags=lunch') == [new]
+    assert feed(user_client, f'&author={user.pk}') == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_feed_around_fan_out_limit(
+    settings, user_client, other_client, author, author_client,
+    create_recipe
+):
+    settings.FEED_FANOUT_LIMIT = 2
+    subscribe(user_client, author)
+    fanned = create_recipe(author_client)['id']
+
+    subscribe(other_client, author)
+    cache.delete(FEED_CELEBRITIES_KEY)
+    merged = create_recipe(author_client)['id']
+    assert not FeedEntry.objects.filter(recipe_id=merged).exists()
+    assert feed(user_client) == [merged, fanned]
+
+    response = other_client.delete(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == 204, response.content
+    assert FeedEntry.objects.filter(recipe_id=merged).exists()
+    assert feed(user_client) == [merged, fanned]
+    assert feed(user_client, '&cursor=') == [merged, fanned]
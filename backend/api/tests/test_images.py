@@ -0,0 +1,52 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from PIL import Image
+
+from api.images import RENDITIONS
+from api.models import Recipe
+from api.storage import recipe_images
+
+RECIPES_URL = '/api/recipes/'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_renditions_are_made_after_commit(
+    anon_client, other_client, create_recipe
+):
+    recipe = create_recipe(other_client)['id']
+    images = Recipe.objects.get(pk=recipe).images
+    assert sorted(images) == sorted(RENDITIONS)
+    for name, size in RENDITIONS.items():
+        with recipe_images.open(images[name]) as rendition:
+            width, height = Image.open(rendition).size
+        assert width <= size[0] and height <= size[1]
+
+    urls = anon_client.get(f'{RECIPES_URL}{recipe}/').json()['images']
+    assert {
+        name: url.split('/media/', 1)[1] for name, url in urls.items()
+    } == images
+
+
+@pytest.mark.django_db(transaction=True)
+def test_identical_images_share_one_file_until_collected(
+    other_client, create_recipe
+):
+    first, second = (create_recipe(other_client)['id'] for _ in range(2))
+    recipes = Recipe.objects.in_bulk([first, second])
+    name = recipes[first].image.name
+    files = {name, *recipes[first].images.values()}
+    _, shard, filename = name.rsplit('/', 2)
+    assert name == recipes[second].image.name
+    assert filename.startswith(shard) and len(filename.split('.')[0]) == 64
+
+    other_client.delete(f'{RECIPES_URL}{first}/')
+    assert recipe_images.exists(name)
+    other_client.delete(f'{RECIPES_URL}{second}/')
+    assert recipe_images.exists(name)
+
+    output = io.StringIO()
+    call_command('collect_media_garbage', '--min-age=0', stdout=output)
+    assert not any(map(recipe_images.exists, files))
+    assert output.getvalue().startswith(f'Удалено файлов: {len(files)},')
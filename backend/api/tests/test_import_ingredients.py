@@ -0,0 +1,48 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from api.models import Ingredient
+
+
+def import_file(path, **options):
+    output = io.StringIO()
+    call_command('import_ingredients', str(path), stdout=output, **options)
+    return output.getvalue().strip()
+
+
+@pytest.mark.django_db
+def test_import_skips_existing_duplicate_and_invalid_rows(tmp_path):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    source = tmp_path / 'ingredients.csv'
+    source.write_text(
+        'name,measurement_unit\n'
+        'соль,г\n'
+        'соль,щепотка\n'
+        'мука,г\n'
+        'мука,г\n'
+        ',г\n'
+        'сахар\n', encoding='utf-8'
+    )
+    assert import_file(source, batch_size=2) == (
+        'Добавлено: 2, уже были в базе: 1, повторы в файле: 1, '
+        'пропущено: 2'
+    )
+    assert sorted(Ingredient.objects.values_list(
+        'name', 'measurement_unit'
+    )) == [('мука', 'г'), ('соль', 'г'), ('соль', 'щепотка')]
+
+    fixture = tmp_path / 'ingredients.json'
+    fixture.write_text(json.dumps([
+        {'model': 'api.ingredient', 'fields': {
+            'name': 'мука', 'measurement_unit': 'г'
+        }},
+        {'name': 'яйца', 'measurement_unit': 'шт'},
+    ], ensure_ascii=False), encoding='utf-8')
+    assert import_file(fixture) == (
+        'Добавлено: 1, уже были в базе: 1, повторы в файле: 0, '
+        'пропущено: 0'
+    )
+    assert Ingredient.objects.count() == 4
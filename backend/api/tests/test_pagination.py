@@ -0,0 +1,52 @@
+import pytest
+
+RECIPES_URL = '/api/recipes/'
+
+
+@pytest.mark.django_db
+def test_search_keeps_rank_order_and_rejects_cursor(
+    anon_client, other_client, create_recipe
+):
+    titled = create_recipe(other_client, name='Суп с сыром суп')['id']
+    create_recipe(other_client, name='Каша')
+    mentioned = create_recipe(other_client, name='Суп дня')['id']
+
+    response = anon_client.get(RECIPES_URL, {'search': 'суп'})
+    assert [recipe['id'] for recipe in response.json()['results']] == [
+        titled, mentioned
+    ]
+    response = anon_client.get(RECIPES_URL, {'search': 'суп', 'cursor': ''})
+    assert response.status_code == 400
+    assert 'cursor' in response.json()
+
+
+def walk(client, url):
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.content
+        pages.append([recipe['id'] for recipe in response.json()['results']])
+        url = response.json()['next']
+    return pages
+
+
+@pytest.mark.django_db
+def test_cursor_and_page_modes_return_the_same_recipes(
+    anon_client, other_client, create_recipe
+):
+    ids = [
+        create_recipe(other_client, name=f'Рецепт {number}')['id']
+        for number in range(5)
+    ][::-1]
+
+    by_page = walk(anon_client, f'{RECIPES_URL}?limit=2')
+    by_cursor = walk(anon_client, f'{RECIPES_URL}?limit=2&cursor=')
+    assert by_page == by_cursor == [ids[:2], ids[2:4], ids[4:]]
+
+    second = anon_client.get(f'{RECIPES_URL}?limit=2&cursor=').json()['next']
+    data = anon_client.get(second).json()
+    assert 'count' not in data
+    assert [
+        recipe['id']
+        for recipe in anon_client.get(data['previous']).json()['results']
+    ] == ids[:2]
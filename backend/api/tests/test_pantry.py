@@ -0,0 +1,37 @@
+import pytest
+
+PANTRY_URL = '/api/recipes/pantry/'
+
+
+def pantry(client, ingredients, **params):
+    response = client.get(PANTRY_URL, {'ingredients': ingredients, **params})
+    assert response.status_code == 200, response.content
+    return [
+        (recipe['id'], recipe['matched_count'], recipe['missing_count'])
+        for recipe in response.json()['results']
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pantry_ranks_and_bounds_missing_ingredients(
+    anon_client, other_client, create_recipe, catalog
+):
+    pair = create_recipe(other_client, components=2)['id']
+    four = create_recipe(other_client, components=4)['id']
+    single = create_recipe(other_client, components=1)['id']
+    first, second = [item.pk for item in catalog['ingredients'][:2]]
+
+    assert pantry(anon_client, [first, second]) == [
+        (pair, 2, 0), (single, 1, 0), (four, 2, 2)
+    ]
+    assert pantry(anon_client, [first, second], max_missing=1) == [
+        (pair, 2, 0), (single, 1, 0)
+    ]
+    assert pantry(anon_client, [second], max_missing=0) == []
+
+    other_client.patch(f'/api/recipes/{pair}/', {'ingredients': [
+        {'id': second, 'amount': 1}
+    ]}, format='json')
+    assert pantry(anon_client, [second], max_missing=0) == [(pair, 1, 0)]
+    response = anon_client.get(PANTRY_URL, {'max_missing': 1})
+    assert response.status_code == 400
@@ -0,0 +1,64 @@
+import pytest
+from django.core.management import call_command
+
+from foodgram.metrics import QueryBudgetExceeded
+
+RECIPES = 8
+
+
+@pytest.fixture
+def populated(user, user_client, other_user, other_client, create_recipe):
+    response = user_client.get(f'/api/users/{other_user.pk}/subscribe/')
+    assert response.status_code == 201, response.content
+    recipes = [
+        create_recipe(other_client, name=f'Рецепт {number}', components=5)
+        for number in range(RECIPES)
+    ]
+    for recipe in recipes[:RECIPES // 2]:
+        user_client.get(f'/api/recipes/{recipe["id"]}/favorite/')
+        user_client.get(f'/api/recipes/{recipe["id"]}/shopping_cart/')
+    call_command('compute_trending', verbosity=0)
+    call_command('build_similar_recipes', verbosity=0)
+    return recipes
+
+
+def budget_urls(recipes, catalog):
+    recipe = recipes[0]['id']
+    first, second = catalog['ingredients'][:2]
+    return {
+        'RecipeViewSet.list': '/api/recipes/',
+        'RecipeViewSet.retrieve': f'/api/recipes/{recipe}/',
+        'RecipeViewSet.trending': '/api/recipes/trending/',
+        'RecipeViewSet.feed': '/api/recipes/feed/',
+        'RecipeViewSet.pantry': (
+            f'/api/recipes/pantry/?ingredients={first.pk}'
+            f'&ingredients={second.pk}'
+        ),
+        'RecipeViewSet.similar': f'/api/recipes/{recipe}/similar/',
+        'IngredientViewSet.list': '/api/ingredients/?name=ингр',
+        'TagViewSet.list': '/api/tags/',
+        'FollowReadViewSet.list': '/api/users/subscriptions/?recipes_limit=3',
+        'ShoppingCartDL.get': '/api/recipes/download_shopping_cart/',
+    }
+
+
+@pytest.mark.django_db
+def test_every_budgeted_endpoint_fits_its_budget(
+    settings, user_client, populated, catalog
+):
+    settings.QUERY_BUDGETS_STRICT = True
+    urls = budget_urls(populated, catalog)
+    assert set(urls) == set(settings.QUERY_BUDGETS)
+    for endpoint, url in urls.items():
+        response = user_client.get(url)
+        assert response.status_code == 200, (endpoint, response.content)
+
+
+@pytest.mark.django_db
+def test_strict_mode_fails_requests_over_budget(
+    settings, user_client, populated
+):
+    settings.QUERY_BUDGETS_STRICT = True
+    settings.QUERY_BUDGETS = {'RecipeViewSet.retrieve': 1}
+    with pytest.raises(QueryBudgetExceeded):
+        user_client.get(f'/api/recipes/{populated[0]["id"]}/')
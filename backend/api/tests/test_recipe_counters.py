@@ -0,0 +1,43 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from api.models import Recipe
+
+RECIPES_URL = '/api/recipes/'
+
+
+def counters(pk):
+    return Recipe.objects.values_list(
+        'favorites_count', 'in_carts_count'
+    ).get(pk=pk)
+
+
+@pytest.mark.django_db
+def test_counters_follow_favorites_and_carts(
+    user_client, other_client, create_recipe
+):
+    recipe = create_recipe(other_client)['id']
+    for client in (user_client, other_client):
+        client.get(f'{RECIPES_URL}{recipe}/favorite/')
+    user_client.get(f'{RECIPES_URL}{recipe}/shopping_cart/')
+    assert counters(recipe) == (2, 1)
+
+    user_client.get(f'{RECIPES_URL}{recipe}/favorite/')
+    user_client.delete(f'{RECIPES_URL}{recipe}/favorite/')
+    user_client.delete(f'{RECIPES_URL}{recipe}/shopping_cart/')
+    user_client.delete(f'{RECIPES_URL}{recipe}/shopping_cart/')
+    assert counters(recipe) == (1, 0)
+
+    Recipe.objects.filter(pk=recipe).update(
+        favorites_count=5, in_carts_count=3
+    )
+    output = io.StringIO()
+    call_command('reconcile_recipe_counters', '--dry-run', stdout=output)
+    assert counters(recipe) == (5, 3)
+    call_command('reconcile_recipe_counters', stdout=output)
+    assert counters(recipe) == (1, 0)
+    assert output.getvalue().splitlines() == [
+        'Рецептов с расхождениями: 1', 'Рецептов с расхождениями: 1'
+    ]
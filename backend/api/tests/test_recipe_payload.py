@@ -0,0 +1,15 @@
+import pytest
+
+RECIPES_URL = '/api/recipes/'
+
+
+@pytest.mark.django_db
+def test_recipe_payload_has_no_search_vector(
+    anon_client, other_client, create_recipe
+):
+    recipe = create_recipe(other_client)
+    assert 'search_vector' not in recipe
+    detail = anon_client.get(f'{RECIPES_URL}{recipe["id"]}/').json()
+    assert 'search_vector' not in detail
+    listed = anon_client.get(RECIPES_URL).json()['results'][0]
+    assert 'search_vector' not in listed
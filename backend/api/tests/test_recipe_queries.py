@@ -0,0 +1,66 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+RECIPES_URL = '/api/recipes/'
+MANY = 12
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, response.content
+    return len(context)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('authorized', (False, True))
+def test_recipe_list_query_count_is_constant(
+    authorized, anon_client, user_client, other_client, create_recipe,
+    django_assert_num_queries
+):
+    client = user_client if authorized else anon_client
+    create_recipe(other_client)
+    anon_client.get(f'{RECIPES_URL}?limit=6')
+    single = count_queries(client, RECIPES_URL)
+
+    for number in range(MANY - 1):
+        recipe = create_recipe(other_client, name=f'Рецепт {number}')
+        response = user_client.get(f'{RECIPES_URL}{recipe["id"]}/favorite/')
+        assert response.status_code == 201, response.content
+    with django_assert_num_queries(single):
+        response = client.get(RECIPES_URL)
+    assert len(response.json()['results']) > 1
+
+
+@pytest.mark.django_db
+def test_uncached_recipe_list_query_count_is_constant(
+    user_client, other_client, create_recipe, django_assert_num_queries
+):
+    url = f'{RECIPES_URL}?is_in_shopping_cart=0&is_favorited=0&limit=50'
+    recipe = create_recipe(other_client)
+    response = user_client.get(
+        f'{RECIPES_URL}{recipe["id"]}/shopping_cart/'
+    )
+    assert response.status_code == 201, response.content
+    user_client.get(url)
+    single = count_queries(user_client, url)
+
+    for number in range(MANY - 1):
+        create_recipe(other_client, name=f'Рецепт {number}')
+    with django_assert_num_queries(single):
+        response = user_client.get(url)
+    assert response.json()['count'] == MANY
+
+
+@pytest.mark.django_db
+def test_recipe_detail_query_count_does_not_grow_with_components(
+    user_client, other_client, create_recipe, django_assert_num_queries
+):
+    small = create_recipe(other_client, components=1)
+    large = create_recipe(other_client, components=10)
+    user_client.get(f'{RECIPES_URL}{small["id"]}/')
+    single = count_queries(user_client, f'{RECIPES_URL}{small["id"]}/')
+    with django_assert_num_queries(single):
+        response = user_client.get(f'{RECIPES_URL}{large["id"]}/')
+    assert len(response.json()['ingredients']) == 10
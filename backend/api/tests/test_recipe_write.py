@@ -0,0 +1,80 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Recipe
+
+RECIPES_URL = '/api/recipes/'
+
+
+@pytest.mark.django_db
+def test_ingredients_are_validated_in_one_query(
+    other_client, create_recipe, catalog
+):
+    recipe = create_recipe(other_client)
+    url = f'{RECIPES_URL}{recipe["id"]}/'
+    ingredient_ids = [item.pk for item in catalog['ingredients']]
+
+    response = other_client.patch(url, {'ingredients': [
+        {'id': pk, 'amount': 1} for pk in ingredient_ids[:3] * 2
+    ]}, format='json')
+    assert response.status_code == 400
+    assert response.json()['ingredients'] == [
+        'Найдены дублирующиеся ингредиенты id %s' % ', '.join(
+            map(str, ingredient_ids[:3])
+        )
+    ]
+
+    with CaptureQueriesContext(connection) as context:
+        response = other_client.patch(url, {'ingredients': [
+            {'id': pk, 'amount': 1} for pk in [*ingredient_ids, 998, 999]
+        ]}, format='json')
+    assert response.status_code == 400
+    assert response.json()['ingredients'] == [
+        'Не найдены ингредиенты с id 998, 999'
+    ]
+    assert sum(
+        'FROM "api_ingredient"' in query['sql']
+        for query in context.captured_queries
+    ) == 1
+
+
+@pytest.mark.django_db
+def test_update_applies_components_and_tags_as_a_diff(
+    other_client, create_recipe, catalog
+):
+    recipe = create_recipe(other_client, components=3, tags=['breakfast'])
+    first, second, third, fourth = [
+        item.pk for item in catalog['ingredients'][:4]
+    ]
+    breakfast, lunch = [tag.pk for tag in catalog['tags']]
+    saved = Recipe.objects.get(pk=recipe['id'])
+    before = dict(
+        saved.component_recipes.values_list('ingredient_id', 'pk')
+    )
+    tag_row = Recipe.tags.through.objects.get(recipe=saved).pk
+
+    response = other_client.patch(f'{RECIPES_URL}{saved.pk}/', {
+        'ingredients': [
+            {'id': first, 'amount': 10},
+            {'id': second, 'amount': 42},
+            {'id': fourth, 'amount': 7},
+        ],
+        'tags': [breakfast, lunch],
+    }, format='json')
+    assert response.status_code == 200, response.content
+
+    after = {
+        component.ingredient_id: component
+        for component in saved.component_recipes.all()
+    }
+    assert sorted(after) == [first, second, fourth]
+    assert after[first].pk == before[first]
+    assert (after[second].pk, after[second].amount) == (before[second], 42)
+    assert third not in after
+    assert Recipe.tags.through.objects.filter(
+        recipe=saved
+    ).values_list('pk', flat=True).first() == tag_row
+    assert sorted(saved.tags.values_list('pk', flat=True)) == [
+        breakfast, lunch
+    ]
@@ -0,0 +1,77 @@
+import pytest
+
+from api.models import (Recipe, RecipeComponent, RecipeQuerySet,
+                        ShoppingListIngredient)
+
+RECIPES_URL = '/api/recipes/'
+
+
+def totals(user):
+    return dict(ShoppingListIngredient.objects.filter(
+        author=user
+    ).values_list('ingredient_id', 'amount'))
+
+
+@pytest.mark.django_db
+def test_incremental_totals_match_rebuild(
+    user, user_client, other_client, create_recipe, catalog
+):
+    first = create_recipe(other_client, components=3)
+    second = create_recipe(other_client, components=5)
+    for recipe in (first, second):
+        response = user_client.get(
+            f'{RECIPES_URL}{recipe["id"]}/shopping_cart/'
+        )
+        assert response.status_code == 201, response.content
+    ingredient_ids = [item.pk for item in catalog['ingredients']]
+    response = other_client.patch(f'{RECIPES_URL}{first["id"]}/', {
+        'ingredients': [
+            {'id': ingredient_ids[0], 'amount': 1},
+            {'id': ingredient_ids[7], 'amount': 5},
+        ],
+    }, format='json')
+    assert response.status_code == 200, response.content
+    incremental = totals(user)
+    assert incremental[ingredient_ids[0]] == 1 + 10
+    assert incremental[ingredient_ids[7]] == 5
+
+    ShoppingListIngredient.objects.rebuild()
+    assert totals(user) == incremental
+
+    response = other_client.delete(f'{RECIPES_URL}{second["id"]}/')
+    assert response.status_code == 204, response.content
+    assert totals(user) == {ingredient_ids[0]: 1, ingredient_ids[7]: 5}
+    user_client.delete(f'{RECIPES_URL}{first["id"]}/shopping_cart/')
+    assert totals(user) == {}
+
+
+@pytest.mark.django_db
+def test_edit_reads_components_after_lock(
+    monkeypatch, user, user_client, other_client, create_recipe, catalog
+):
+    recipe = create_recipe(other_client, components=2)
+    user_client.get(f'{RECIPES_URL}{recipe["id"]}/shopping_cart/')
+    first, second = [item.pk for item in catalog['ingredients'][:2]]
+    lock = RecipeQuerySet.lock
+
+    def lock_after_concurrent_edit(queryset, pk):
+        monkeypatch.setattr(RecipeQuerySet, 'lock', lock)
+        RecipeComponent.objects.filter(
+            recipe_id=pk, ingredient_id=first
+        ).update(amount=50)
+        ShoppingListIngredient.objects.update_recipe(
+            Recipe.objects.get(pk=pk), {first: 40}
+        )
+        return lock(queryset, pk)
+
+    monkeypatch.setattr(RecipeQuerySet, 'lock', lock_after_concurrent_edit)
+    response = other_client.patch(f'{RECIPES_URL}{recipe["id"]}/', {
+        'ingredients': [
+            {'id': first, 'amount': 5},
+            {'id': second, 'amount': 11},
+        ],
+    }, format='json')
+    assert response.status_code == 200, response.content
+    assert totals(user) == {first: 5, second: 11}
+    ShoppingListIngredient.objects.rebuild()
+    assert totals(user) == {first: 5, second: 11}
@@ -0,0 +1,25 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db
+def test_similar_recipes_are_ordered_by_similarity(
+    anon_client, other_client, create_recipe
+):
+    base = create_recipe(other_client, components=6)['id']
+    near = create_recipe(other_client, components=5)['id']
+    mid = create_recipe(
+        other_client, components=3, tags=['breakfast']
+    )['id']
+    call_command('build_similar_recipes', stdout=io.StringIO())
+
+    response = anon_client.get(f'/api/recipes/{base}/similar/')
+    assert response.status_code == 200, response.content
+    similar = [
+        (recipe['id'], recipe['similarity']) for recipe in response.json()
+    ]
+    assert [pk for pk, _ in similar] == [near, mid]
+    assert similar[0][1] > similar[1][1] > 0
+    assert anon_client.get('/api/recipes/0/similar/').status_code == 404
@@ -0,0 +1,60 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+
+
+@pytest.fixture
+def make_author(django_user_model, user_client, create_recipe):
+    def make(number, recipes):
+        author = django_user_model.objects.create_user(
+            username=f'author{number}', email=f'author{number}@example.com',
+            password='password'
+        )
+        client = APIClient()
+        client.force_authenticate(author)
+        ids = [
+            create_recipe(client, name=f'Рецепт {number}.{index}')['id']
+            for index in range(recipes)
+        ]
+        response = user_client.get(f'/api/users/{author.pk}/subscribe/')
+        assert response.status_code == 201, response.content
+        return author.pk, ids[::-1]
+    return make
+
+
+def subscriptions(client, query):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(f'{SUBSCRIPTIONS_URL}?{query}')
+    assert response.status_code == 200, response.content
+    return response.json(), len(context)
+
+
+@pytest.mark.django_db
+def test_previews_are_bounded_per_author_in_constant_queries(
+    user_client, make_author
+):
+    authors = dict([make_author(0, 4), make_author(1, 1)])
+    data, queries = subscriptions(user_client, 'limit=10&recipes_limit=2')
+    assert {
+        author['id']: (
+            [recipe['id'] for recipe in author['recipes']],
+            author['recipes_count'], author['is_subscribed']
+        ) for author in data['results']
+    } == {
+        pk: (ids[:2], len(ids), True) for pk, ids in authors.items()
+    }
+
+    make_author(2, 3)
+    make_author(3, 2)
+    data, more_queries = subscriptions(user_client, 'limit=10&recipes_limit=2')
+    assert data['count'] == 4
+    assert more_queries == queries
+    data, _ = subscriptions(user_client, 'recipes_limit=1')
+    assert [len(author['recipes']) for author in data] == [1] * 4
+
+    response = user_client.get(f'{SUBSCRIPTIONS_URL}?recipes_limit=-1')
+    assert response.status_code == 400
+    assert 'recipes_limit' in response.json()
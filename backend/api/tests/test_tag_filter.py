@@ -0,0 +1,44 @@
+import pytest
+
+RECIPES_URL = '/api/recipes/'
+
+
+def listed(client, query):
+    response = client.get(f'{RECIPES_URL}?{query}&limit=50')
+    assert response.status_code == 200, response.content
+    return sorted(recipe['id'] for recipe in response.json()['results'])
+
+
+@pytest.mark.django_db
+def test_tags_match_any_and_all(anon_client, other_client, create_recipe):
+    both = create_recipe(other_client, tags=['breakfast', 'lunch'])['id']
+    breakfast = create_recipe(other_client, tags=['breakfast'])['id']
+    lunch = create_recipe(other_client, tags=['lunch'])['id']
+
+    assert listed(anon_client, 'tags=breakfast') == [both, breakfast]
+    assert listed(anon_client, 'tags=breakfast&tags=lunch') == [
+        both, breakfast, lunch
+    ]
+    assert listed(
+        anon_client, 'tags=breakfast&tags=lunch&tags_match=all'
+    ) == [both]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_tag_filter_sees_new_recipe_right_after_commit(
+    anon_client, other_client, create_recipe
+):
+    first = create_recipe(other_client, tags=['breakfast'])['id']
+    assert listed(anon_client, 'tags=breakfast') == [first]
+
+    second = create_recipe(other_client, tags=['breakfast'])['id']
+    assert listed(anon_client, 'tags=breakfast') == [first, second]
+
+    other_client.patch(
+        f'{RECIPES_URL}{first}/', {'tags': [
+            tag['id'] for tag in anon_client.get('/api/tags/').json()
+            if tag['slug'] == 'lunch'
+        ]}, format='json'
+    )
+    assert listed(anon_client, 'tags=breakfast') == [second]
+    assert listed(anon_client, 'tags=lunch') == [first]
@@ -0,0 +1,27 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+SHOPPING_LIST_VERSION_KEY = 'shopping_list_version_%s'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def drop_shopping_list_versions(author_ids):
+    keys = [SHOPPING_LIST_VERSION_KEY % pk for pk in author_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
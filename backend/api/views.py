@@ -1,47 +1,129 @@
-from django.core.cache import cache
-from django.http import HttpResponse
+from hashlib import md5
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.filters import IngredientFilter, RecipeFilter
-from api.models import (FavorRecipe, Ingredient, Recipe, RecipeComponent,
-                        ShoppingList, Tag)
+from api.cache import (RECIPES_LIST_TIMEOUT, feed_celebrities,
+                       get_or_compute, get_shop_list, ingredients,
+                       is_recipe_list_cacheable, overlay_user_flags,
+                       recipe_list_key, shopping_list_key, tags)
+from api.exports import render_csv, render_pdf, render_txt
+from api.filters import RecipeFilter
+from api.models import (FavorRecipe, FeedEntry, Ingredient, Recipe,
+                        ShoppingList, ShoppingListIngredient, Tag)
+from api.pantry import pantry_index
 from api.permissions import IsOwnerOrReadOnly
-from api.serializers import (FavorSerializer, IngredientSerializer,
-                             RecipeReadSerializer, RecipeWriteSerializer,
-                             ShoppingSerializer, TagSerializer)
-from api.paginators import PageLimitSetPagination
+from api.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
+from api.search import search_ingredients
+from api.serializers import (INGREDIENT_SEARCH_LIMIT, FavorSerializer,
+                             IngredientQuerySerializer, IngredientSerializer,
+                             PantryQuerySerializer, RecipeReadSerializer,
+                             RecipeWriteSerializer, ShoppingSerializer,
+                             TagSerializer)
+from api.paginators import (FeedPagination, PageLimitSetPagination,
+                            RecipePagination, TrendingPagination)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    pagination_class = PageLimitSetPagination
+    pagination_class = RecipePagination
     filter_class = RecipeFilter
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Recipe.objects.prefetch_related(
-        'ingredients', 'author', 'tags'
+    queryset = Recipe.objects.select_related('author').prefetch_related(
+        'tags', 'component_recipes'
     )
 
-    def get_queryset(self):
-        user = self.request.user
-        queryset = cache.get('recipes_qs')
-        if not queryset:
-            queryset = super().get_queryset()
-            cache.set('recipes_qs', queryset)
-        if user.is_anonymous or user is None:
-            return queryset
-        user_qs = cache.get('recipes_user_%s' % user.id)
-        if not user_qs:
-            user_qs = queryset.opt_annotations(user)
-            cache.set('recipes_user_%s' % user.id, user_qs)
-        return user_qs
+    def get_queryset(self, user=None):
+        queryset = super().get_queryset().opt_annotations(
+            user or self.request.user
+        )
+        if self.action == 'trending':
+            queryset = queryset.trending()
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if not is_recipe_list_cacheable(request.query_params):
+            return super().list(request, *args, **kwargs)
+        data = get_or_compute(
+            recipe_list_key(request), self.anonymous_page,
+            RECIPES_LIST_TIMEOUT
+        )
+        return Response(overlay_user_flags(data, request.user))
+
+    def anonymous_page(self):
+        queryset = self.filter_queryset(self.get_queryset(AnonymousUser()))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data).data
+
+    @action(detail=False, pagination_class=TrendingPagination)
+    def trending(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    @action(
+        detail=False, pagination_class=FeedPagination,
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        recipes = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(FeedEntry.objects.timeline(
+            request.user, feed_celebrities(),
+            recipes if recipes.query.has_filters() else None
+        ))
+        found = self.get_queryset().in_bulk(
+            [entry['recipe_id'] for entry in page]
+        )
+        serializer = self.get_serializer([
+            found[entry['recipe_id']] for entry in page
+            if entry['recipe_id'] in found
+        ], many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, pagination_class=PageLimitSetPagination)
+    def pantry(self, request):
+        params = PantryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        page = self.paginate_queryset(pantry_index.get().match(
+            params.validated_data['ingredients'],
+            params.validated_data.get('max_missing')
+        ))
+        found = self.get_queryset().in_bulk([match['id'] for match in page])
+        page = [match for match in page if match['id'] in found]
+        serializer = self.get_serializer(
+            [found[match['id']] for match in page], many=True
+        )
+        return self.get_paginated_response([
+            dict(recipe, **match)
+            for recipe, match in zip(serializer.data, page)
+        ])
+
+    @action(detail=True, pagination_class=None)
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        recipes = self.get_queryset().filter(
+            similar_to__recipe=recipe
+        ).annotate(similarity=F('similar_to__score')).order_by(
+            'similar_to__rank'
+        )
+        serializer = self.get_serializer(recipes, many=True)
+        return Response([
+            dict(data, similarity=similar.similarity)
+            for data, similar in zip(serializer.data, recipes)
+        ])
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        if recipe.author_id not in feed_celebrities():
+            FeedEntry.objects.fan_out(recipe)
 
     def get_serializer_class(self):
         if self.request.method in ['GET', ]:
@@ -58,16 +140,23 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny, )
-    filter_class = IngredientFilter
     search_fields = ['name', ]
     pagination_class = None
 
-    def get_queryset(self):
-        queryset = cache.get('ingredients_qs')
-        if not queryset:
-            queryset = Ingredient.objects.all()
-            cache.set('ingredients_qs', queryset)
-        return queryset
+    def list(self, request, *args, **kwargs):
+        params = IngredientQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        name = params.validated_data.get('name')
+        limit = params.validated_data.get('limit')
+        if name:
+            found = search_ingredients(
+                self.get_queryset(), name, limit or INGREDIENT_SEARCH_LIMIT
+            )
+        else:
+            found = list(ingredients.get())[:limit]
+        return Response([
+            item for item in map(ingredients.lookup, found) if item
+        ])
 
 
 class CommonViewSet(APIView):
@@ -75,6 +164,7 @@ class CommonViewSet(APIView):
     serializer_class = None
     obj = Recipe
     del_obj = None
+    counter_field = None
 
     def get(self, request, recipe_id):
         user = request.user
@@ -86,7 +176,7 @@ class CommonViewSet(APIView):
             data=data, context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_create(serializer)
         return Response(
             serializer.data,
             status=status.HTTP_201_CREATED)
@@ -96,16 +186,32 @@ class CommonViewSet(APIView):
         deletion_obj = get_object_or_404(
             self.del_obj, author=user, recipes_id=recipe_id
         )
-        deletion_obj.delete()
+        self.perform_destroy(deletion_obj)
         return Response(
             'Removed', status=status.HTTP_204_NO_CONTENT
         )
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        instance = serializer.save()
+        Recipe.objects.change_counter(
+            instance.recipes_id, self.counter_field, 1
+        )
+        return instance
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Recipe.objects.change_counter(
+            instance.recipes_id, self.counter_field, -1
+        )
+        instance.delete()
+
 
 class FavoriteViewSet(CommonViewSet):
     obj = Recipe
     serializer_class = FavorSerializer
     del_obj = FavorRecipe
+    counter_field = 'favorites_count'
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -114,24 +220,62 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return Response(list(tags.get().values()))
+
 
 class ShoppingViewSet(CommonViewSet):
     serializer_class = ShoppingSerializer
     obj = Recipe
     del_obj = ShoppingList
+    counter_field = 'in_carts_count'
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        Recipe.objects.lock(serializer.validated_data['recipes'].pk)
+        instance = super().perform_create(serializer)
+        ShoppingListIngredient.objects.add_recipe(
+            instance.author, instance.recipes
+        )
+        return instance
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Recipe.objects.lock(instance.recipes_id)
+        ShoppingListIngredient.objects.remove_recipe(
+            instance.author, instance.recipes
+        )
+        super().perform_destroy(instance)
+
+
+def shopping_list_etag(request):
+    return md5(
+        f'{request.accepted_renderer.format}:'
+        f'{shopping_list_key(request.user)}'.encode()
+    ).hexdigest()
 
 
 class ShoppingCartDL(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = [PlainTextRenderer, CSVRenderer, PDFRenderer]
+    exporters = {
+        'txt': render_txt,
+        'csv': render_csv,
+        'pdf': render_pdf,
+    }
 
-    @method_decorator(cache_page(60 * 60))
+    @method_decorator(condition(etag_func=shopping_list_etag))
     def get(self, request):
         user = request.user
-        shop_list = RecipeComponent.objects.shop_list(user=user)
-        wishlist = [f'{item["name"]} - {item["sum"]} '
-                    f'{item["unit"]} \r\n' for item in shop_list]
-        wishlist.append('\r\n')
-        wishlist.append('FoodGram, 2021')
-        response = HttpResponse(wishlist, 'Content-Type: text/plain')
-        response['Content-Disposition'] = 'attachment; filename="wishlist.txt"'
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            self.exporters[renderer.format](get_shop_list(user)),
+            content_type=(
+                f'{renderer.media_type}; charset={renderer.charset}'
+                if renderer.charset else renderer.media_type
+            )
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="wishlist.{renderer.format}"'
+        )
         return response
@@ -0,0 +1,121 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.cache import ingredients, tags
+from api.models import Ingredient, Tag
+from api.pantry import pantry_index
+from api.search import ingredient_index, recipe_search_index, tag_index
+from api.tasks import executor
+
+REFERENCE_CACHES = (
+    ingredients, tags, ingredient_index, tag_index, recipe_search_index,
+    pantry_index,
+)
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'red').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(settings, tmp_path):
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-tests',
+    }}
+    settings.MEDIA_ROOT = str(tmp_path)
+    from django.core.cache import cache
+    cache.clear()
+    for reference in REFERENCE_CACHES:
+        reference.reset()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def inline_tasks(monkeypatch):
+    """Фоновые задачи выполняются сразу, чтобы тесты не ждали пул."""
+    def submit(func, *args):
+        func(*args)
+    monkeypatch.setattr(executor, 'submit', submit)
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='cook', email='cook@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def other_user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='guest', email='guest@example.com', password='password'
+    )
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def other_client(other_user):
+    client = APIClient()
+    client.force_authenticate(other_user)
+    return client
+
+
+@pytest.fixture
+def catalog(db):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(10)
+    )
+    return {
+        'tags': [
+            Tag.objects.create(
+                name='Завтрак', color='#E26C2D', slug='breakfast'
+            ),
+            Tag.objects.create(name='Обед', color='#49B64E', slug='lunch'),
+        ],
+        'ingredients': list(Ingredient.objects.order_by('pk')),
+    }
+
+
+@pytest.fixture
+def create_recipe(catalog):
+    image = make_image()
+    ingredient_ids = [ingredient.pk for ingredient in catalog['ingredients']]
+    tag_ids = {tag.slug: tag.pk for tag in catalog['tags']}
+
+    def create(client, name='Рецепт', components=3, tags=None):
+        response = client.post('/api/recipes/', {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': image,
+            'tags': [tag_ids[slug] for slug in tags or tag_ids],
+            'ingredients': [
+                {'id': pk, 'amount': 10 + number}
+                for number, pk in enumerate(ingredient_ids[:components])
+            ],
+        }, format='json')
+        assert response.status_code == 201, response.content
+        return response.json()
+    return create
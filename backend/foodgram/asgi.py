@@ -1,7 +1,11 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('DJANGO_URLCONF', 'foodgram.asgi_urls')
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+from foodgram.async_views import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
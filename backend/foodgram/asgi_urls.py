@@ -0,0 +1,34 @@
+"""URL-схема ASGI-режима (foodgram.asgi).
+
+Маршруты те же, что в foodgram.urls, но каждое представление обёрнуто
+в асинхронное. Без обёртки Django 3.1 выполнял бы все синхронные
+представления в одном общем потоке.
+"""
+from django.urls import URLPattern, URLResolver
+
+from foodgram import urls
+from foodgram.async_views import offload, offload_recipe_list
+
+ASYNC_VIEWS = {
+    'recipes-list': offload_recipe_list,
+}
+
+
+def async_patterns(patterns):
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            result.append(URLResolver(
+                pattern.pattern, async_patterns(pattern.url_patterns),
+                pattern.default_kwargs, pattern.app_name, pattern.namespace
+            ))
+            continue
+        wrap = ASYNC_VIEWS.get(pattern.name, offload)
+        result.append(URLPattern(
+            pattern.pattern, wrap(pattern.callback), pattern.default_args,
+            pattern.name
+        ))
+    return result
+
+
+urlpatterns = async_patterns(urls.urlpatterns)
@@ -0,0 +1,191 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.cache import is_recipe_list_cacheable, recipe_list_key
+from foodgram.metrics import current
+
+STREAM_QUEUE_SIZE = 4
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASGI_THREADS, thread_name_prefix='foodgram-asgi'
+)
+cache_executor = ThreadPoolExecutor(
+    max_workers=settings.ASGI_CACHE_THREADS,
+    thread_name_prefix='foodgram-asgi-cache'
+)
+
+
+def _call(func, args, kwargs):
+    metrics = current.get()
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            if metrics is not None:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """Выполняет func в пуле ASGI_THREADS потоков с контекстом запроса.
+
+    Соединения с БД живут в потоках пула, поэтому их число ограничено
+    размером пула, а закрываются они так же, как в конце WSGI-запроса.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, contextvars.copy_context().run, _call, func, args, kwargs
+    )
+
+
+async def run_cache(func, *args):
+    """Обращение к кэшу в отдельном пуле: в Django 3.1 нет async API кэша.
+
+    Отдельный пул не даёт быстрым чтениям из кэша ждать в очереди за
+    запросами к БД.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        cache_executor, partial(func, *args)
+    )
+
+
+def render_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    return response
+
+
+async def stream_in_pool(response):
+    """Куски потокового ответа, прочитанные в потоке пула.
+
+    Генератор ответа целиком выполняется в одном потоке пула (и с одним
+    соединением с БД, как в WSGI), а куски передаются в цикл событий
+    через очередь на STREAM_QUEUE_SIZE элементов: медленный клиент
+    придерживает генератор, а не копит ответ в памяти.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(STREAM_QUEUE_SIZE)
+    stopped = threading.Event()
+
+    def put(part):
+        asyncio.run_coroutine_threadsafe(queue.put(part), loop).result()
+
+    def produce():
+        try:
+            for part in response:
+                if stopped.is_set():
+                    break
+                put(part)
+        finally:
+            put(None)
+
+    producer = loop.create_task(run_sync(produce))
+    part = b''
+    try:
+        while True:
+            part = await queue.get()
+            if part is None:
+                break
+            yield part
+    finally:
+        stopped.set()
+        while part is not None:
+            part = await queue.get()
+        await producer
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGIHandler, не перебирающий потоковые ответы в цикле событий.
+
+    Django 3.1 читает StreamingHttpResponse (выгрузки списка покупок)
+    синхронно прямо в цикле событий и блокирует все остальные запросы
+    воркера.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ] + [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        async for part in stream_in_pool(response):
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await run_sync(response.close)
+
+
+def offload(view):
+    """Асинхронная обёртка синхронного представления."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_sync(render_view, view, request, *args, **kwargs)
+
+    return wrapper
+
+
+async def cached_recipe_page(request):
+    key = await run_cache(recipe_list_key, Request(request))
+    entry = await run_cache(cache.get, key)
+    if entry is None:
+        return None
+    value, _, expires = entry
+    return value if time.time() < expires else None
+
+
+def offload_recipe_list(view):
+    """Список рецептов: анонимная страница из кэша без похода в пул БД.
+
+    Промах, устаревшее значение и запросы с токеном обрабатывает обычное
+    представление, которое и наполняет кэш.
+    """
+    offloaded = offload(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if (request.method == 'GET' and
+                'HTTP_AUTHORIZATION' not in request.META and
+                'text/html' not in request.META.get('HTTP_ACCEPT', '') and
+                is_recipe_list_cacheable(request.GET)):
+            data = await cached_recipe_page(request)
+            if data is not None:
+                response = HttpResponse(
+                    JSONRenderer().render(data),
+                    content_type='application/json'
+                )
+                patch_vary_headers(response, ('Accept', ))
+                return response
+        return await offloaded(request, *args, **kwargs)
+
+    return wrapper
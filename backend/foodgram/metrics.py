@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+current = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    """Счётчики одного запроса: SQL-запросы, время БД и сериализации."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class SerializerTimingMixin:
+    """Учитывает время to_representation в метриках текущего запроса.
+
+    Вложенные сериализаторы не считаются повторно.
+    """
+
+    def to_representation(self, instance):
+        metrics = current.get()
+        if metrics is None:
+            return super().to_representation(instance)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            if not metrics.serializer_depth:
+                metrics.serializer_time += time.perf_counter() - started
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, share):
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': round(self.sum / self.count, 2) if self.count else None,
+            'max': round(self.max, 2),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip(
+                [*map(str, self.buckets), '+Inf'], self.counts
+            )),
+        }
+
+
+class Registry:
+    """Гистограммы по эндпоинтам в памяти процесса (у каждого воркера свои)."""
+
+    fields = (
+        ('total_ms', TIME_BUCKETS), ('db_ms', TIME_BUCKETS),
+        ('serializer_ms', TIME_BUCKETS), ('queries', QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def observe(self, endpoint, **values):
+        with self.lock:
+            histograms = self.endpoints.get(endpoint)
+            if histograms is None:
+                histograms = self.endpoints[endpoint] = {
+                    name: Histogram(buckets) for name, buckets in self.fields
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'endpoints': {
+                    endpoint: {
+                        name: histogram.snapshot()
+                        for name, histogram in histograms.items()
+                    } for endpoint, histograms in sorted(
+                        self.endpoints.items()
+                    )
+                },
+            }
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+registry = Registry()
+
+
+def check_query_budget(endpoint, queries):
+    budget = settings.QUERY_BUDGETS.get(endpoint)
+    if budget is None or queries <= budget:
+        return
+    message = (
+        f'{endpoint}: {queries} SQL-запросов при бюджете {budget}'
+    )
+    if settings.QUERY_BUDGETS_STRICT:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
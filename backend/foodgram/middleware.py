@@ -0,0 +1,79 @@
+import asyncio
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from foodgram.metrics import (RequestMetrics, check_query_budget, current,
+                              registry)
+
+
+def endpoint_name(view_func, method):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    handler = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{handler}'
+
+
+class MetricsMiddleware:
+    """Число SQL-запросов, время БД, сериализации и ответа по эндпоинтам.
+
+    Значения уходят в заголовок Server-Timing и в гистограммы
+    foodgram.metrics.registry; превышение QUERY_BUDGETS логируется,
+    а при QUERY_BUDGETS_STRICT завершает запрос ошибкой.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        """ASGI-режим: SQL-запросы считает foodgram.async_views.run_sync."""
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        total = time.perf_counter() - started
+        endpoint = getattr(request, 'metrics_endpoint', 'unresolved')
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serializer;dur={metrics.serializer_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        registry.observe(
+            endpoint, total_ms=total * 1000, db_ms=metrics.db_time * 1000,
+            serializer_ms=metrics.serializer_time * 1000,
+            queries=metrics.queries
+        )
+        check_query_budget(endpoint, metrics.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_endpoint = endpoint_name(view_func, request.method)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,7 +43,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+ROOT_URLCONF = os.getenv('DJANGO_URLCONF', 'foodgram.urls')
 SITE_ID = 1
 TEMPLATES = [
     {
@@ -77,6 +79,35 @@ DATABASES = {
 }
 
 
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'foodgram')
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', 60 * 5))
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': CACHE_KEY_PREFIX,
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv(
+                'CACHE_DIR',
+                os.path.join(tempfile.gettempdir(), 'foodgram_cache')
+            ),
+            'KEY_PREFIX': CACHE_KEY_PREFIX,
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 AUTH_USER_MODEL = 'users.User'
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -134,3 +165,28 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 5000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 500))
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
+ASGI_CACHE_THREADS = int(os.getenv('ASGI_CACHE_THREADS', 4))
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+
+QUERY_BUDGETS = {
+    'RecipeViewSet.list': 10,
+    'RecipeViewSet.retrieve': 6,
+    'RecipeViewSet.trending': 10,
+    'RecipeViewSet.feed': 8,
+    'RecipeViewSet.pantry': 8,
+    'RecipeViewSet.similar': 6,
+    'IngredientViewSet.list': 2,
+    'TagViewSet.list': 2,
+    'FollowReadViewSet.list': 5,
+    'ShoppingCartDL.get': 4,
+}
+QUERY_BUDGETS_STRICT = os.getenv('QUERY_BUDGETS_STRICT') == '1'
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.views import MetricsView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
     path('api/', include('api.urls')),
 ]
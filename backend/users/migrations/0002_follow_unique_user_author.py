@@ -0,0 +1,35 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:41
+
+from django.db import migrations, models
+import django.db.models.expressions
+from django.db.models import F, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    Follow.objects.filter(user=F('author')).delete()
+    keep = Follow.objects.values('user', 'author').annotate(
+        first=Min('pk')
+    ).order_by().values('first')
+    Follow.objects.exclude(pk__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='follow_user_unique_author'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='follow_not_self'),
+        ),
+    ]
@@ -1,15 +1,24 @@
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
-from django.db.models import BooleanField, Count, Value
+from django.db.models import (BooleanField, Count, IntegerField, OuterRef,
+                              Subquery, Value)
+from django.db.models.functions import Coalesce
 
 
 class UserQuerySet(models.QuerySet):
     def follow_recipes(self, user=None):
+        recipes = self.model._meta.get_field('recipes').related_model
+        recipes_count = recipes.objects.filter(
+            author=OuterRef('pk')
+        ).order_by().values('author').annotate(count=Count('pk'))
         queryset = self.filter(
             following__user=user
-        ).order_by('pk').prefetch_related('recipes').annotate(
+        ).order_by('pk').annotate(
             is_subscribed=Value(True, output_field=BooleanField()),
-            recipes_count=Count('recipes__author')
+            recipes_count=Coalesce(
+                Subquery(recipes_count.values('count')), 0,
+                output_field=IntegerField()
+            )
         )
         return queryset
 
@@ -60,3 +69,12 @@ class Follow(models.Model):
         ordering = ('pk', )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                name='follow_user_unique_author', fields=['user', 'author']
+            ),
+            models.CheckConstraint(
+                name='follow_not_self',
+                check=~models.Q(user=models.F('author'))
+            ),
+        ]
@@ -1,16 +1,47 @@
+from collections import defaultdict
+
 from rest_framework import serializers
 
+from api.images import rendition_urls
 from api.models import Recipe
+from foodgram.metrics import SerializerTimingMixin
 from users.models import Follow, User
 
 
-class RecipeTinySerializer(serializers.ModelSerializer):
+class RecipeTinySerializer(SerializerTimingMixin,
+                           serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, recipe):
+        return rendition_urls(recipe, self.context.get('request'))['thumbnail']
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if not limit:
+        return None
+    field = serializers.IntegerField(min_value=0)
+    try:
+        return field.run_validation(limit)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({'recipes_limit': error.detail})
 
-class FollowSerializer(serializers.ModelSerializer):
+
+def recipe_previews(authors, limit=None):
+    previews = defaultdict(list)
+    for recipe in Recipe.objects.previews(
+        [author.pk for author in authors], limit
+    ).only('id', 'name', 'image', 'images', 'cooking_time', 'author_id'):
+        previews[recipe.author_id].append(recipe)
+    return previews
+
+
+class FollowSerializer(SerializerTimingMixin,
+                       serializers.ModelSerializer):
     queryset = User.objects.all()
     user = serializers.PrimaryKeyRelatedField(queryset=queryset)
     author = serializers.PrimaryKeyRelatedField(queryset=queryset)
@@ -39,12 +70,14 @@ class FollowSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
-        return FollowReadSerializer(
-            instance.author,
-            context=context).data
+        author = User.ext_objects.follow_recipes(
+            user=instance.user
+        ).get(pk=instance.author_id)
+        return FollowReadSerializer(author, context=context).data
 
 
-class FollowReadSerializer(serializers.ModelSerializer):
+class FollowReadSerializer(SerializerTimingMixin,
+                           serializers.ModelSerializer):
     is_subscribed = serializers.BooleanField(read_only=True)
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.IntegerField(read_only=True)
@@ -57,13 +90,12 @@ class FollowReadSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes(self, obj):
-        num = self.context["request"].query_params.get('recipes_limit')
-        if num:
-            num = int(num)
-            recipes = obj.recipes.all()[:num]
-        else:
-            recipes = obj.recipes.all()
-        return RecipeTinySerializer(recipes, many=True).data
+        previews = self.context.get('recipes')
+        if previews is None:
+            previews = recipe_previews(
+                [obj], get_recipes_limit(self.context['request'])
+            )
+        return RecipeTinySerializer(previews.get(obj.pk, []), many=True).data
 
 
 class ListFavorSerializer(serializers.ModelSerializer):
@@ -71,7 +103,8 @@ class ListFavorSerializer(serializers.ModelSerializer):
         model = User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SerializerTimingMixin,
+                     serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField('get_is_subscribed')
 
     class Meta:
@@ -82,6 +115,8 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         request = self.context.get('request')
         if request.user and request.user.is_authenticated:
             return Follow.objects.filter(
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from djoser.views import UserViewSet
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
@@ -8,11 +11,15 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from api.paginators import PageNumberPaginatorModified
+from api.cache import feed_celebrities, restore_fan_out
+from api.models import FeedEntry
+from api.paginators import SubscriptionPagination
 from api.permissions import IsOwnerOrReadOnly
+from api.tasks import run_in_background
 from users.models import Follow
 from users.serializers import (FollowReadSerializer, FollowSerializer,
-                               UserSerializer)
+                               UserSerializer, get_recipes_limit,
+                               recipe_previews)
 
 User = get_user_model()
 
@@ -20,7 +27,7 @@ User = get_user_model()
 class FollowReadViewSet(ReadOnlyModelViewSet):
     serializer_class = FollowReadSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPaginatorModified
+    pagination_class = SubscriptionPagination
 
     def get_queryset(self):
         qs = User.ext_objects.follow_recipes(user=self.request.user).all()
@@ -31,6 +38,18 @@ class FollowReadViewSet(ReadOnlyModelViewSet):
         context.update({'request': self.request})
         return context
 
+    def list(self, request, *args, **kwargs):
+        limit = get_recipes_limit(request)
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        authors = list(queryset) if page is None else page
+        context = self.get_serializer_context()
+        context['recipes'] = recipe_previews(authors, limit)
+        serializer = self.get_serializer(authors, many=True, context=context)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
 
 class AuthorViewSet(UserViewSet):
     queryset = User.objects.all()
@@ -49,7 +68,13 @@ class FollowViewSet(APIView):
         }
         serializer = FollowSerializer(data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        try:
+            with transaction.atomic():
+                serializer.save()
+                if author_id not in feed_celebrities():
+                    FeedEntry.objects.backfill(user, author_id)
+        except IntegrityError:
+            raise ValidationError('Вы подписаны')
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, author_id):
@@ -57,6 +82,12 @@ class FollowViewSet(APIView):
         follow = get_object_or_404(
             Follow, user_id=user.id, author_id=author_id
         )
-        follow.delete()
+        with transaction.atomic():
+            FeedEntry.objects.prune(user, author_id)
+            follow.delete()
+            if (author_id in feed_celebrities() and
+                    Follow.objects.filter(author_id=author_id).count() <
+                    settings.FEED_FANOUT_LIMIT):
+                run_in_background(restore_fan_out, author_id)
         return Response('Вы успешно отписаны',
                         status=status.HTTP_204_NO_CONTENT)